@@ -11,8 +11,10 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 import os
+import sys
 
 
 load_dotenv()
@@ -21,7 +23,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv('SECRET_KEY')
 
-DEBUG = True
+# settings profile: "dev" (the default), "test" (the default of "manage.py test") or "prod"
+DJANGO_ENV = os.getenv('DJANGO_ENV') or ('test' if sys.argv[1:2] == ['test'] else 'dev')
+if DJANGO_ENV not in ('dev', 'test', 'prod'):
+    raise ImproperlyConfigured(f'DJANGO_ENV must be "dev", "test" or "prod", not "{DJANGO_ENV}"')
+
+# DEBUG keeps every SQL statement in connection.queries, only dev runs with it by default
+DEBUG = os.getenv('DJANGO_DEBUG', str(DJANGO_ENV == 'dev')).lower() in ('1', 'true', 'yes')
+if DJANGO_ENV == 'prod' and DEBUG:
+    raise ImproperlyConfigured('DEBUG must be off when DJANGO_ENV is "prod", unset DJANGO_DEBUG')
 
 ALLOWED_HOSTS = ['*']
 
@@ -38,7 +48,6 @@ INSTALLED_APPS = [
     'rangefilter',
     'admin_auto_filters',
     'django_admin_listfilter_dropdown',
-    'debug_toolbar',
     'drf_spectacular',
     'rest_framework',
     'django_filters',
@@ -49,17 +58,26 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'general.metrics.MetricsMiddleware',
+    'general.nplusone.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'general.replica.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # 3rd party
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# dev only
+if DJANGO_ENV == 'dev':
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+# test only: factories hash a password for every user
+if DJANGO_ENV == 'test':
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -90,6 +108,35 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+# reads of safe requests go to the replica when it is configured, see general/replica.py
+if os.getenv('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DATABASE_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['general.replica.ReplicaRouter']
+# "production" tunes SQLite for concurrent writers and keeps connections open between requests,
+# see SQLITE_PRAGMAS; compare the profiles with "manage.py benchmark_writes"
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'production' if DJANGO_ENV == 'prod' else 'default')
+SQLITE_PRODUCTION_PRAGMAS = {
+    # readers and the writer do not block each other
+    'journal_mode': 'WAL',
+    # with WAL only a power loss can drop the last commits, never corrupt the file
+    'synchronous': 'NORMAL',
+    # milliseconds a writer waits for the lock instead of failing with "database is locked"
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # negative: KiB instead of pages
+    'cache_size': -64 * 1024,
+}
+# set on every new SQLite connection but the replica's by general.signals
+SQLITE_PRAGMAS = {}
+if DATABASE_PROFILE == 'production':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    # not the replica: sync_replica replaces its file, which a persistent connection would not see
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -148,6 +195,8 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
 }
+# /api/schema/ serves the files written here by "manage.py build_schema", see general/schema.py
+OPENAPI_SCHEMA_DIR = os.getenv('OPENAPI_SCHEMA_DIR', BASE_DIR / 'build' / 'openapi')
 # rest framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',) ,
@@ -157,3 +206,72 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DATETIME_FORMAT': "%Y-%b-%dT%H:%M:%S",
 }
+
+# home feed
+# posts of authors with more friends than this are not copied into timelines on write
+FEED_FANOUT_THRESHOLD = int(os.getenv('FEED_FANOUT_THRESHOLD', 1000))
+# number of latest posts copied into a timeline when a new friendship is made
+FEED_BACKFILL_SIZE = 50
+FEED_BATCH_SIZE = 1000
+
+# user profile
+# number of latest posts and friends embedded into /api/users/{id}/ and /api/users/myself/
+PROFILE_PREVIEW_SIZE = 5
+
+# cache
+# "responses" holds serialized api bodies (see general/cache.py): LocMemCache evicts
+# the least recently used entries above MAX_ENTRIES and expires them after TIMEOUT.
+# Use a shared backend (redis, memcached) with several worker processes,
+# otherwise invalidation only reaches the process that made the change.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TTL', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+
+# friend graph
+# suggestions read an in-process copy of the friend graph (see general/graph.py),
+# rebuilt after FRIEND_GRAPH_TTL seconds; set FRIEND_GRAPH_SNAPSHOT to a file path
+# to let workers start from the snapshot written by "manage.py snapshot_friend_graph"
+FRIEND_GRAPH_TTL = int(os.getenv('FRIEND_GRAPH_TTL', 300))
+FRIEND_GRAPH_SNAPSHOT = os.getenv('FRIEND_GRAPH_SNAPSHOT')
+FRIEND_SUGGESTIONS_LIMIT = 20
+# /api/users/{id}/path/ looks this many friendships away at most
+FRIEND_PATH_MAX_DEPTH = 6
+
+# bulk endpoints
+# most items accepted by /api/reactions/bulk/ and /api/comments/bulk/ in one request
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', 100))
+
+# metrics
+# latency, SQL and response size of every request per viewset action, served on /metrics
+# (see general/metrics.py); with several worker processes set METRICS_MULTIPROC_DIR
+# to a directory shared by them, and empty it when the workers are restarted
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = 5
+# when set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; prod must set it
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+if DJANGO_ENV == 'prod' and not METRICS_TOKEN:
+    raise ImproperlyConfigured('METRICS_TOKEN must be set when DJANGO_ENV is "prod", /metrics would be public')
+
+# N+1 detection
+# a query shape repeated NPLUSONE_THRESHOLD times in one request is an N+1 query
+# (see general/nplusone.py); NPLUSONE_SAMPLE_RATE of requests are checked and
+# their N+1 queries logged as warnings of the "general.nplusone" logger
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_SAMPLE_RATE = float(os.getenv('NPLUSONE_SAMPLE_RATE', 0))
+
+# read replica
+# a client is pinned to the primary for REPLICA_STICKY_SECONDS after a write to read its own writes,
+# keep the pins in a cache shared by the workers
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+REPLICA_PIN_CACHE_ALIAS = 'default'
@@ -17,24 +17,28 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from drf_spectacular.views import (SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView)
+from drf_spectacular.views import (SpectacularSwaggerView, SpectacularRedocView)
 from rest_framework_simplejwt.views import ( TokenObtainPairView, TokenRefreshView,)
+from general.metrics import metrics_view
+from general.schema import schema_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     # swagger
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', schema_view, name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     # JWT-token
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     # general.api
-    path('api/', include('general.api.urls'))
+    path('api/', include('general.api.urls')),
+    # prometheus
+    path('metrics', metrics_view, name='metrics'),
 
 ]
 
-if settings.DEBUG:
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
 
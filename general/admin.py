@@ -114,10 +114,7 @@ class PostModelAdmin(admin.ModelAdmin):
         return obj.body
 
     def get_comments_count(self, obj):
-        return obj.comments.count()
-
-    def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related("comments")
+        return obj.comments_count
 
     get_body.short_description = 'body'
     get_comments_count.short_description = 'comments'
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from general import cache
+from general.models import Post
+
+
+class CachedRetrieveMixin:
+    """
+    Serves a detail body from the versioned response cache
+
+    Fields listed in ``viewer_fields`` depend on the current user, they are
+    kept out of the shared body and computed by ``get_viewer_data`` on a hit.
+    Links in ``link_fields`` are cached as paths and made absolute for each
+    request, so the host of the first reader does not leak to the others.
+
+    Subclasses set ``cache_namespace`` and, when they have viewer fields,
+    define ``get_viewer_data(pk)`` returning a dict of them.
+    """
+    cache_namespace = None
+    viewer_fields = ()
+    link_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_namespace is None:
+            raise ImproperlyConfigured(f'{cls.__name__} must set cache_namespace.')
+        if cls.viewer_fields and not callable(getattr(cls, 'get_viewer_data', None)):
+            raise ImproperlyConfigured(f'{cls.__name__} must define get_viewer_data() for its viewer_fields.')
+
+    def get_cache_variant(self):
+        return ''
+
+    def get_cache_pk(self):
+        # "01" and "1" are the same object, keys must be the integer pk signals invalidate
+        try:
+            return int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+
+    def cached_response(self, pk, get_instance):
+        viewer_data = {}
+
+        def build():
+            data = dict(self.get_serializer(get_instance()).data)
+            for field in self.viewer_fields:
+                viewer_data[field] = data.pop(field)
+            return data
+
+        body = cache.get_or_build(self.cache_namespace, pk, build, variant=self.get_cache_variant())
+        if not viewer_data and self.viewer_fields:
+            viewer_data = self.get_viewer_data(pk)
+        links = {field: self.request.build_absolute_uri(body[field]) for field in self.link_fields if body[field]}
+        return Response({**body, **viewer_data, **links})
+
+
+class BulkCreateMixin:
+    """
+    Adds POST {prefix}/bulk/
+
+    Items are validated by ``bulk_serializer_class`` without queries, the
+    posts they refer to are checked with one query and the valid items are
+    written at once by ``perform_bulk_create(items)``, which subclasses
+    define: it takes the validated data of the accepted items and returns
+    a result dict per item.
+    """
+    bulk_serializer_class = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.bulk_serializer_class is None:
+            raise ImproperlyConfigured(f'{cls.__name__} must set bulk_serializer_class.')
+        if not callable(getattr(cls, 'perform_bulk_create', None)):
+            raise ImproperlyConfigured(f'{cls.__name__} must define perform_bulk_create().')
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        method takes a list of up to BULK_MAX_ITEMS items and writes them at once
+
+        invalid items do not stop the others, `results` has a status per item in request order
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValidationError({'non_field_errors': [f'At most {settings.BULK_MAX_ITEMS} items are allowed.']})
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = self.bulk_serializer_class(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'status': 'error', 'errors': serializer.errors}
+
+        existing = set(Post.objects.filter(pk__in={data['post'] for _, data in valid}).values_list('pk', flat=True))
+        accepted = []
+        for index, data in valid:
+            if data['post'] in existing:
+                accepted.append((index, data))
+            else:
+                results[index] = {'status': 'error',
+                                  'errors': {'post': [f'Invalid pk "{data["post"]}" - object does not exist.']}}
+
+        if accepted:
+            created = self.perform_bulk_create([data for _, data in accepted])
+            for (index, _), result in zip(accepted, created):
+                results[index] = {'status': 'ok', **result}
+        return Response({'results': results})
@@ -0,0 +1,356 @@
+import binascii
+import json
+from base64 import b64decode, b64encode
+from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, CursorPagination, \
+    Cursor, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination: no COUNT(*) and no OFFSET scan,
+    so every page costs the same no matter how deep it is
+    """
+    ordering = '-id'
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page number pagination by default, keyset pagination on request
+
+    ``?pagination=cursor`` switches to opaque next/previous cursors
+    without total count. Next and previous links keep the parameter.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    cursor_ordering = '-id'
+    paginate_by_default = True
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def get_cursor_paginator(self):
+        paginator = KeysetPagination()
+        paginator.ordering = self.cursor_ordering
+        paginator.page_size = self.page_size
+        return paginator
+
+    def is_cursor_mode(self, request):
+        return request.query_params.get(self.mode_query_param) == self.cursor_mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = self.get_cursor_paginator()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        if not self.paginate_by_default:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Set to "cursor" to use keyset pagination',
+            'schema': {'type': 'string', 'enum': [self.cursor_mode]},
+        })
+        parameters.append({
+            'name': KeysetPagination.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': KeysetPagination.cursor_query_description,
+            'schema': {'type': 'string'},
+        })
+        return parameters
+
+
+def cursor_link(path, position):
+    """
+    Relative link to the keyset page of ``path`` that starts right after ``position``
+
+    :param path: path of an endpoint paginated with OptionalCursorPagination
+    :param position: ordering value of the last item already shown
+    """
+    paginator = KeysetPagination()
+    paginator.base_url = replace_query_param(path,
+                                             OptionalCursorPagination.mode_query_param,
+                                             OptionalCursorPagination.cursor_mode)
+    return paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(position)))
+
+
+class PostPagination(OptionalCursorPagination):
+    cursor_ordering = 'id'
+
+
+class CommentPagination(OptionalCursorPagination):
+    cursor_ordering = '-id'
+
+
+class UserPagination(OptionalCursorPagination):
+    cursor_ordering = '-id'
+
+
+class UserPostsPagination(OptionalCursorPagination):
+    cursor_ordering = '-id'
+
+
+class MessageHistoryPagination(BasePagination):
+    """
+    Windowed chat history keyed on message id, newest message first
+
+    ``?before=<id>`` returns the messages older than ``id``,
+    ``?after=<id>`` (or ``?since=<last seen id>``) returns only the newer ones.
+    ``?limit=<n>`` sets the window size, capped by ``max_limit``.
+    """
+    default_limit = 30
+    max_limit = 100
+    limit_query_param = 'limit'
+    before_query_param = 'before'
+    after_query_param = 'after'
+    since_query_param = 'since'
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(request.query_params[self.limit_query_param],
+                                 strict=True,
+                                 cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def get_message_id(self, request, *params):
+        for param in params:
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                return _positive_int(value, strict=True)
+            except ValueError:
+                raise ValidationError({param: 'must be a positive message id'})
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        limit = self.get_limit(request)
+        self.before = self.get_message_id(request, self.before_query_param)
+        self.after = self.get_message_id(request, self.after_query_param, self.since_query_param)
+
+        if self.before is not None:
+            queryset = queryset.filter(id__lt=self.before)
+        if self.after is not None:
+            # the window starts right after the last seen message
+            messages = list(queryset.filter(id__gt=self.after).order_by('id')[:limit + 1])
+            self.has_more = len(messages) > limit
+            messages = messages[:limit][::-1]
+        else:
+            messages = list(queryset.order_by('-id')[:limit + 1])
+            self.has_more = len(messages) > limit
+            messages = messages[:limit]
+
+        if messages:
+            self.after = messages[0].id
+            self.before = messages[-1].id
+        return messages
+
+    def get_paginated_response(self, data):
+        return Response({
+            'has_more': self.has_more,
+            'before': self.before,
+            'after': self.after,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'has_more': {'type': 'boolean'},
+                'before': {'type': 'integer', 'nullable': True},
+                'after': {'type': 'integer', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.before_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Return messages older than this message id',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.after_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Return messages newer than this message id',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.since_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Last seen message id, alias of "after"',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.limit_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of messages to return, at most {self.max_limit}',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class FeedPagination(BasePagination):
+    """
+    Keyset pagination over a Feed, newest post first
+
+    ``?before=<post id>`` continues after the last shown post.
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 50
+    page_size_query_param = 'limit'
+    before_query_param = 'before'
+
+    def paginate_queryset(self, feed, request, view=None):
+        try:
+            limit = _positive_int(request.query_params[self.page_size_query_param],
+                                  strict=True,
+                                  cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            limit = self.page_size
+        before = request.query_params.get(self.before_query_param)
+        try:
+            before = None if before is None else _positive_int(before, strict=True)
+        except ValueError:
+            raise ValidationError({self.before_query_param: 'must be a positive post id'})
+
+        posts = feed.window(before=before, limit=limit + 1)
+        self.next_before = posts[limit - 1].id if len(posts) > limit else None
+        self.base_url = request.build_absolute_uri()
+        return posts[:limit]
+
+    def get_next_link(self):
+        if self.next_before is None:
+            return None
+        return replace_query_param(self.base_url, self.before_query_param, self.next_before)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.before_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Return posts older than this post id',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of posts to return, at most {self.max_page_size}',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class SearchPagination(BasePagination):
+    """
+    Keyset pagination over a Search by relevance
+
+    ``?cursor=`` is the opaque position of the last shown result.
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 50
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            rank, kind, pk = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return [float(rank), str(kind), int(pk)]
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        encoded = b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, search, request, view=None):
+        try:
+            limit = _positive_int(request.query_params[self.page_size_query_param],
+                                  strict=True,
+                                  cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            limit = self.page_size
+        self.base_url = request.build_absolute_uri()
+        results = search.window(after=self.decode_cursor(request), limit=limit + 1)
+        self.next_position = results[limit - 1].position if len(results) > limit else None
+        return results[:limit]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results to return, at most {self.max_page_size}',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -1,13 +1,71 @@
 import sys
 from rest_framework.exceptions import ValidationError
-from django.db.models import Q
-from rest_framework.serializers import ModelSerializer, \
-    SerializerMethodField, CurrentUserDefault, HiddenField, CharField, DateTimeField
-from general.models import (User, Post, Comment, Reaction, Chat, Messages)
+from django.db.models import Q, Count
+from rest_framework.serializers import ModelSerializer, Serializer, \
+    SerializerMethodField, CurrentUserDefault, HiddenField, CharField, DateTimeField, ReadOnlyField, \
+    IntegerField, FloatField, ChoiceField
+from drf_spectacular.utils import extend_schema_field
+from general.models import (User, Post, Comment, Reaction, Chat, Messages, REACTION_COUNTER_FIELDS)
+from general.services import toggle_reaction
+from django.urls import reverse
+from .pagination import cursor_link
 
 # User Serializers
 
 
+def get_friend_ids(request):
+    """
+    Ids of the current user's friends, loaded once per request
+
+    :param request: rest_framework request
+    :return: set of user ids
+    """
+    if not hasattr(request, '_friend_ids'):
+        request._friend_ids = set(
+            User.friends.through.objects.filter(from_user_id=request.user.pk)
+            .values_list('to_user_id', flat=True)
+        )
+    return request._friend_ids
+
+
+def get_mutual_friend_counts(request, user_ids):
+    """
+    Numbers of friends the current user shares with each of ``user_ids``
+
+    Counts are remembered on the request, users not counted yet are counted
+    with one grouped query over the friends table.
+
+    :param request: rest_framework request
+    :param user_ids: ids of the users being serialized, e.g. a page
+    :return: dict of user id to count
+    """
+    if not hasattr(request, '_mutual_friend_counts'):
+        request._mutual_friend_counts = {}
+    counts = request._mutual_friend_counts
+    missing = {pk for pk in user_ids if pk not in counts}
+    if missing:
+        friendship = User.friends.through.objects
+        counts.update(dict.fromkeys(missing, 0))
+        missing.discard(request.user.pk)
+        counts.update(
+            friendship.filter(from_user_id__in=missing,
+                              to_user_id__in=friendship.filter(from_user_id=request.user.pk).values('to_user_id'))
+            .values('from_user_id').annotate(count=Count('to_user_id'))
+            .values_list('from_user_id', 'count').order_by()
+        )
+    return counts
+
+
+def mutual_friend_count(serializer, obj):
+    request = serializer.context['request']
+    counts = getattr(request, '_mutual_friend_counts', {})
+    if obj.pk in counts:
+        return counts[obj.pk]
+    # with many=True the whole page is counted on its first row, the other rows return above
+    page = serializer.parent.instance if serializer.parent is not None else [obj]
+    return get_mutual_friend_counts(request, [user.pk for user in page])[obj.pk]
+
+
 class UserRegistrationSerializer(ModelSerializer):
     class Meta:
         model = User
@@ -31,6 +89,7 @@ class UserRegistrationSerializer(ModelSerializer):
 
 class UserListSerializer(ModelSerializer):
     is_friend = SerializerMethodField()
+    mutual_friend_count = SerializerMethodField()
 
     class Meta:
         model = User
@@ -38,11 +97,26 @@ class UserListSerializer(ModelSerializer):
                   'username',
                   'first_name',
                   'last_name',
-                  'is_friend')
+                  'is_friend',
+                  'mutual_friend_count')
 
     def get_is_friend(self, obj) -> bool:
-        current_user = self.context["request"].user
-        return current_user in obj.friends.all()
+        return obj.pk in get_friend_ids(self.context["request"])
+
+    def get_mutual_friend_count(self, obj) -> int:
+        return mutual_friend_count(self, obj)
+
+
+class UserSuggestionSerializer(ModelSerializer):
+    mutual_friends = IntegerField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = ('id',
+                  'username',
+                  'first_name',
+                  'last_name',
+                  'mutual_friends')
 
 
 class NestedPostSerializer(ModelSerializer):
@@ -60,11 +134,30 @@ class NestedFriendsSerializer(ModelSerializer):
         fields = ['id', 'username']
 
 
+class FriendPathSerializer(Serializer):
+    """
+    Friend chain from the current user to another user, both included
+
+    ``distance`` and ``path`` are null and empty when no chain was found.
+    """
+    distance = IntegerField(allow_null=True)
+    path = NestedFriendsSerializer(many=True)
+
+
 class UserRetrieveSerializer(ModelSerializer):
+    """
+    Profile with counts and capped previews of the latest posts and friends
+
+    ``posts_next`` and ``friends_next`` link to the rest of the lists.
+    """
     is_friend = SerializerMethodField()
-    friend_count = SerializerMethodField()
-    posts = NestedPostSerializer(many=True)
-    friends = NestedFriendsSerializer(many=True)
+    mutual_friend_count = SerializerMethodField()
+    friend_count = IntegerField(read_only=True)
+    post_count = IntegerField(read_only=True)
+    posts = NestedPostSerializer(many=True, source='latest_posts')
+    posts_next = SerializerMethodField()
+    friends = NestedFriendsSerializer(many=True, source='friends_preview')
+    friends_next = SerializerMethodField()
 
     class Meta:
         model = User
@@ -75,16 +168,32 @@ class UserRetrieveSerializer(ModelSerializer):
             'first_name',
             'last_name',
             'is_friend',
+            'mutual_friend_count',
             'friend_count',
+            'post_count',
             "posts",
-            'friends'
+            'posts_next',
+            'friends',
+            'friends_next'
         ]
 
     def get_is_friend(self, obj) -> bool:
-        return obj in self.context['request'].user.friends.all()
+        return obj.pk in get_friend_ids(self.context['request'])
+
+    def get_mutual_friend_count(self, obj) -> int:
+        return mutual_friend_count(self, obj)
 
-    def get_friend_count(self, obj) -> int:
-        return obj.friends.count()
+    def get_next_link(self, url_name, obj, preview, count):
+        if count <= len(preview):
+            return None
+        # cached for every reader, made absolute by CachedRetrieveMixin.link_fields
+        return cursor_link(reverse(url_name, kwargs={'pk': obj.pk}), preview[-1].pk)
+
+    def get_posts_next(self, obj) -> str:
+        return self.get_next_link('users-posts', obj, obj.latest_posts, obj.post_count)
+
+    def get_friends_next(self, obj) -> str:
+        return self.get_next_link('users-friends', obj, obj.friends_preview, obj.friend_count)
 
 
 # Post Serializers
@@ -96,9 +205,24 @@ class UserShortSerializer(ModelSerializer):
         fields = ('id', 'username')
 
 
+@extend_schema_field({'type': 'object', 'additionalProperties': {'type': 'integer'}})
+class ReactionCountsField(ReadOnlyField):
+    """
+    Reaction totals of a post read from its counter columns
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, post):
+        return {value: getattr(post, field) for value, field in REACTION_COUNTER_FIELDS.items()}
+
+
 class PostListSerializer(ModelSerializer):
     author = UserShortSerializer()
     body = SerializerMethodField()
+    reaction_counts = ReactionCountsField()
 
     class Meta:
         model = Post
@@ -106,7 +230,9 @@ class PostListSerializer(ModelSerializer):
                   'author',
                   'title',
                   'created_at',
-                  'body')
+                  'body',
+                  'comments_count',
+                  'reaction_counts')
 
     def get_body(self, obj) -> str:
         max_length = 60
@@ -128,6 +254,7 @@ class PostRetrieveSerializer(ModelSerializer):
     author = UserShortSerializer()
     my_reaction = SerializerMethodField()
     reactions = NestedReactionsSerializer(many=True)
+    reaction_counts = ReactionCountsField()
 
     class Meta:
         model = Post
@@ -135,17 +262,36 @@ class PostRetrieveSerializer(ModelSerializer):
                   'title',
                   'body',
                   'author',
+                  'comments_count',
+                  'reaction_counts',
                   'reactions',
                   'my_reaction')
 
-    def get_my_reaction(self, obj):
-        user = self.context['request'].user
+    def get_my_reaction(self, obj) -> str:
+        # annotated by PostViewSet.get_queryset
+        return self.describe_reaction(getattr(obj, 'my_reaction_value', None))
+
+    @staticmethod
+    def describe_reaction(value):
+        if value is None:
+            return 'you have not react on this post'
+        return value
+
 
-        try:
-            reaction = obj.reactions.get(author=user).value
-        except Reaction.DoesNotExist:
-            reaction = 'you have not react on this post'
-        return reaction
+class PostSummarySerializer(PostRetrieveSerializer):
+    """
+    Post detail with reaction totals instead of the list of reactions
+    """
+    reactions = None
+
+    class Meta(PostRetrieveSerializer.Meta):
+        fields = ('id',
+                  'title',
+                  'body',
+                  'author',
+                  'comments_count',
+                  'reaction_counts',
+                  'my_reaction')
 
 
 class PostCreateUpdateSerializer(ModelSerializer):
@@ -185,7 +331,7 @@ class CommentSerializer(ModelSerializer):
 
 class ReactionSerializer(ModelSerializer):
     author = HiddenField(
-        default=UserShortSerializer()
+        default=CurrentUserDefault()
     )
 
     class Meta:
@@ -195,18 +341,23 @@ class ReactionSerializer(ModelSerializer):
                   'author',
                   'created_at',
                   'post')
+        # uniqueness is enforced by the upsert in toggle_reaction
+        validators = []
 
     def create(self, validated_data):
-        reaction = Reaction.objects.filter(author=validated_data['author'],
-                                           post=validated_data['post']).last()
-        if not reaction:
-            Reaction.objects.create(**validated_data)
-        if reaction.value == validated_data['value']:
-            reaction.value = None
-        else:
-            reaction.value = validated_data['value']
-        reaction.save()
-        return reaction
+        return toggle_reaction(validated_data['author'],
+                               validated_data['post'],
+                               validated_data.get('value'))
+
+
+class BulkReactionSerializer(Serializer):
+    post = IntegerField(min_value=1)
+    value = ChoiceField(choices=Reaction.Values.choices, allow_null=True)
+
+
+class BulkCommentSerializer(Serializer):
+    post = IntegerField(min_value=1)
+    body = CharField()
 
 
 class ChatSerializer(ModelSerializer):
@@ -236,17 +387,24 @@ class ChatSerializer(ModelSerializer):
 
 
 class MessageListSerializer(ModelSerializer):
-    message_author = CharField()
+    message_author = SerializerMethodField()
 
     class Meta:
         model = Messages
         fields = ("id", "content", "message_author", "created_at")
 
+    def get_message_author(self, obj) -> str:
+        if obj.author_id == self.context["request"].user.id:
+            return "Вы"
+        chat = self.context["chat"]
+        author = chat.user_1 if obj.author_id == chat.user_1_id else chat.user_2
+        return author.first_name
+
 
 class ChatListSerializer(ModelSerializer):
     companion_name = SerializerMethodField()
-    last_message_content = SerializerMethodField()
-    last_message_datetime = DateTimeField()
+    last_message_content = CharField(source="last_message_preview")
+    last_message_datetime = DateTimeField(source="last_message_at")
 
     class Meta:
         model = Chat
@@ -257,9 +415,6 @@ class ChatListSerializer(ModelSerializer):
             "last_message_datetime",
         )
 
-    def get_last_message_content(self, obj) -> str:
-        return obj.last_message_content
-
     def get_companion_name(self, obj) -> str:
         companion = obj.user_1 if obj.user_2 == self.context["request"].user else obj.user_2
         return f"{companion.first_name} {companion.last_name}"
@@ -282,3 +437,20 @@ class MessageSerializer(ModelSerializer):
         fields = ("id", "author", "content", "chat", "created_at")
 
 
+# Search Serializers
+
+
+class SearchResultSerializer(Serializer):
+    type = CharField(source='kind')
+    id = IntegerField()
+    rank = FloatField()
+    snippet = CharField()
+    title = SerializerMethodField()
+    post = SerializerMethodField()
+    author = UserShortSerializer(source='obj.author')
+
+    def get_title(self, result) -> str:
+        return result.obj.title if result.kind == 'post' else None
+
+    def get_post(self, result) -> int:
+        return result.id if result.kind == 'post' else result.obj.post_id
@@ -0,0 +1,43 @@
+import io
+import json
+import os
+import tempfile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from general.benchmark import SCENARIOS
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchmarkTestCase(TestCase):
+
+    def setUp(self):
+        call_command('generate_dataset', users=40, seed=1, stdout=io.StringIO())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.report_path = os.path.join(directory.name, 'report.json')
+        self.baseline_path = os.path.join(directory.name, 'baseline.json')
+
+    def benchmark(self, **options):
+        call_command('benchmark', output=self.report_path, iterations=2, warmup=0, stdout=io.StringIO(), **options)
+        with open(self.report_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def test_report_covers_every_route(self):
+        report = self.benchmark()
+
+        self.assertEqual(report['uncovered_routes'], [])
+        for name, result in report['endpoints'].items():
+            self.assertLess(result['status'], 400, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(len(report['endpoints']), len(SCENARIOS))
+
+    def test_extra_queries_are_regressions(self):
+        report = self.benchmark()
+        report['endpoints']['GET /api/users/']['queries'] -= 1
+        with open(self.baseline_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file)
+
+        # latency of two requests is noise, only the query count is checked here
+        with self.assertRaisesMessage(CommandError, '1 regressions'):
+            self.benchmark(baseline=self.baseline_path, latency_tolerance=1000)
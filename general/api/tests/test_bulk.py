@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import skipUnless
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general.factories import UserFactory, PostFactory, ReactionFactory
+from general.api.mixins import BulkCreateMixin
+from general.models import Reaction, Comment, Post
+from general.nplusone import NPlusOneTestMixin
+from general.replica import copy_database
+from general.services import bulk_toggle_reactions
+
+
+class BulkReactionTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.posts = PostFactory.create_batch(3)
+        self.url = "/api/reactions/bulk/"
+
+    def test_bulk_toggle(self):
+        """
+        [post]
+        /api/reactions/bulk/
+        """
+        ReactionFactory(author=self.user, post=self.posts[2], value=Reaction.Values.SAD)
+        items = [
+            {"post": self.posts[0].pk, "value": Reaction.Values.SMILE},
+            {"post": self.posts[0].pk, "value": Reaction.Values.HEART},
+            {"post": self.posts[1].pk, "value": Reaction.Values.LAUGH},
+            {"post": self.posts[1].pk, "value": Reaction.Values.LAUGH},
+            {"post": self.posts[2].pk, "value": Reaction.Values.SAD},
+            {"post": self.posts[2].pk, "value": "angry"},
+            {"post": 10 ** 6, "value": Reaction.Values.SMILE},
+        ]
+
+        response = self.client.post(path=self.url, data=items, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], ["ok"] * 5 + ["error"] * 2)
+        self.assertEqual([result["value"] for result in results[:5]],
+                         [Reaction.Values.SMILE, Reaction.Values.HEART, Reaction.Values.LAUGH, None, None])
+        self.assertIn("value", results[5]["errors"])
+        self.assertIn("post", results[6]["errors"])
+
+        values = dict(Reaction.objects.filter(author=self.user).values_list("post_id", "value"))
+        self.assertEqual(values, {self.posts[0].pk: Reaction.Values.HEART,
+                                  self.posts[1].pk: None,
+                                  self.posts[2].pk: None})
+        counters = {post.pk: (post.heart_count, post.laugh_count, post.sad_count)
+                    for post in Post.objects.filter(pk__in=[post.pk for post in self.posts])}
+        self.assertEqual(counters, {self.posts[0].pk: (1, 0, 0),
+                                    self.posts[1].pk: (0, 0, 0),
+                                    self.posts[2].pk: (0, 0, 0)})
+
+    def test_bulk_queries_do_not_depend_on_item_count(self):
+        items = [{"post": self.posts[0].pk, "value": Reaction.Values.SMILE}] * 51
+
+        # posts, write lock, reactions, upsert, one counter update and savepoints
+        with self.assertNumQueries(7):
+            response = self.client.post(path=self.url, data=items, format='json')
+
+        self.assertEqual(response.data["results"][-1]["value"], Reaction.Values.SMILE)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).smile_count, 1)
+
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_too_many_items(self):
+        items = [{"post": self.posts[0].pk, "value": Reaction.Values.SMILE}] * 3
+
+        response = self.client.post(path=self.url, data=items, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Reaction.objects.exists())
+
+
+class BulkCommentTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.post = PostFactory()
+        self.url = "/api/comments/bulk/"
+
+    def test_bulk_comments(self):
+        """
+        [post]
+        /api/comments/bulk/
+        """
+        items = [{"post": self.post.pk, "body": f"comment {i}"} for i in range(3)]
+        items.append({"post": self.post.pk})
+
+        response = self.client.post(path=self.url, data=items, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], ["ok", "ok", "ok", "error"])
+        comments = Comment.objects.filter(author=self.user).order_by("id")
+        self.assertEqual([result["id"] for result in results[:3]], [comment.pk for comment in comments])
+        self.assertEqual([comment.body for comment in comments], ["comment 0", "comment 1", "comment 2"])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+
+    def test_not_a_list(self):
+        response = self.client.post(path=self.url, data={"post": self.post.pk, "body": "x"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_hooks_required(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'must set bulk_serializer_class'):
+            type('NoSerializerViewSet', (BulkCreateMixin,), {})
+        with self.assertRaisesMessage(ImproperlyConfigured, 'must define perform_bulk_create()'):
+            type('NoWriterViewSet', (BulkCreateMixin,), {'bulk_serializer_class': object})
+
+
+@skipUnless(connection.vendor == 'sqlite', 'the write lock of SQLite transactions')
+class BulkReactionConcurrencyTestCase(TransactionTestCase):
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL', 'busy_timeout': 5000})
+    def test_concurrent_writer_does_not_lock_out_bulk(self):
+        user = UserFactory()
+        post = PostFactory()
+        outcome = {}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'db.sqlite3')
+            connection.ensure_connection()
+            copy_database(connection.connection, path)
+            other = sqlite3.connect(path, timeout=0, isolation_level=None, check_same_thread=False)
+
+            def write_between(execute, sql, params, many, context):
+                result = execute(sql, params, many, context)
+                # another writer commits after the reactions were read, before they are written
+                if sql.startswith('SELECT') and 'general_reaction' in sql and 'other' not in outcome:
+                    try:
+                        other.execute('UPDATE general_post SET title = title')
+                        outcome['other'] = 'committed'
+                    except sqlite3.OperationalError as error:
+                        outcome['other'] = str(error)
+                return result
+
+            def toggle():
+                # a connection of this thread only, to the file copy
+                thread_connection = connections['default']
+                thread_connection.settings_dict = {**thread_connection.settings_dict, 'NAME': path}
+                try:
+                    with thread_connection.execute_wrapper(write_between):
+                        outcome['results'] = bulk_toggle_reactions(user, [(post.pk, Reaction.Values.SAD)])
+                except Exception as error:
+                    outcome['error'] = error
+                finally:
+                    thread_connection.close()
+
+            thread = threading.Thread(target=toggle)
+            thread.start()
+            thread.join()
+            other.close()
+
+        self.assertNotIn('error', outcome)
+        self.assertEqual([Reaction.Values.SAD], outcome['results'])
+        # the other writer waits for the bulk transaction instead of invalidating its read
+        self.assertEqual('database is locked', outcome['other'])
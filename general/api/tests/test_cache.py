@@ -0,0 +1,120 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general import cache
+from general.api.mixins import CachedRetrieveMixin
+from general.factories import UserFactory, PostFactory, ReactionFactory
+from general.models import Reaction
+from general.nplusone import NPlusOneTestMixin
+
+
+class ResponseCacheTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        cache.stats.reset()
+
+    def test_post_detail_cached_without_viewer_fields(self):
+        """
+        [get]
+        /api/posts/{pk}/
+        """
+        post = PostFactory()
+        url = f"/api/posts/{post.pk}/"
+        self.client.get(path=url, format='json')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(path=url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["my_reaction"], "you have not react on this post")
+        self.assertEqual(cache.stats.snapshot()["post"], {"hits": 1, "misses": 1})
+
+        other_user = UserFactory()
+        ReactionFactory(post=post, author=other_user, value=Reaction.Values.SAD)
+        self.client.force_authenticate(user=other_user)
+
+        response = self.client.get(path=url, format='json')
+
+        self.assertEqual(response.data["my_reaction"], Reaction.Values.SAD)
+        self.assertEqual(response.data["reaction_counts"]["sad"], 1)
+        self.assertEqual(cache.stats.snapshot()["post"], {"hits": 1, "misses": 2})
+
+    def test_user_detail_invalidated_by_friends(self):
+        """
+        [get]
+        /api/users/{pk}/
+        """
+        user = UserFactory()
+        url = f"/api/users/{user.pk}/"
+        response = self.client.get(path=url, format='json')
+        self.assertFalse(response.data["is_friend"])
+
+        self.client.post(path=f"{url}add/", format='json')
+
+        response = self.client.get(path=url, format='json')
+        self.assertTrue(response.data["is_friend"])
+        self.assertEqual(response.data["friend_count"], 1)
+
+        response = self.client.get(path="/api/users/myself/", format='json')
+        self.assertEqual(response.data["friends"], [{"id": user.pk, "username": user.username}])
+        self.assertFalse(response.data["is_friend"])
+
+    def test_deleted_post_not_served(self):
+        post = PostFactory(author=self.user)
+        url = f"/api/posts/{post.pk}/"
+        self.client.get(path=url, format='json')
+
+        self.client.delete(path=url)
+
+        response = self.client.get(path=url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_padded_pk_invalidated(self):
+        post = PostFactory(author=self.user)
+        self.client.get(path=f"/api/posts/0{post.pk}/", format='json')
+
+        self.client.patch(path=f"/api/posts/{post.pk}/", data={"title": "new title"}, format='json')
+
+        response = self.client.get(path=f"/api/posts/0{post.pk}/", format='json')
+        self.assertEqual(response.data["title"], "new title")
+        self.assertEqual(self.client.get(path="/api/posts/abc/", format='json').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(path="/api/users/abc/", format='json').status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(PROFILE_PREVIEW_SIZE=1, ALLOWED_HOSTS=['testserver', 'internal'])
+    def test_user_links_built_per_request(self):
+        user = UserFactory()
+        PostFactory.create_batch(2, author=user)
+        url = f"/api/users/{user.pk}/"
+        self.client.get(path=url, format='json', HTTP_HOST='internal')
+
+        response = self.client.get(path=url, format='json')
+
+        self.assertEqual(cache.stats.snapshot()["user"], {"hits": 1, "misses": 1})
+        self.assertTrue(response.data["posts_next"].startswith(f"http://testserver/api/users/{user.pk}/posts/?"))
+
+    def test_rename_invalidates_bodies_showing_username(self):
+        friend = UserFactory()
+        self.user.friends.add(friend)
+        post = PostFactory(author=self.user)
+        other_post = PostFactory()
+        ReactionFactory(post=other_post, author=self.user)
+        urls = [f"/api/posts/{post.pk}/", f"/api/posts/{other_post.pk}/", f"/api/users/{friend.pk}/"]
+        for url in urls:
+            self.client.get(path=url, format='json')
+
+        self.user.username = "renamed"
+        self.user.save()
+
+        post_body, other_post_body, friend_body = [self.client.get(path=url, format='json').data for url in urls]
+        self.assertEqual(post_body["author"]["username"], "renamed")
+        self.assertEqual(other_post_body["reactions"][0]["author"]["username"], "renamed")
+        self.assertEqual(friend_body["friends"][0]["username"], "renamed")
+
+    def test_cache_hooks_required(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'must set cache_namespace'):
+            type('NoNamespaceViewSet', (CachedRetrieveMixin,), {})
+        with self.assertRaisesMessage(ImproperlyConfigured, 'must define get_viewer_data()'):
+            type('NoViewerDataViewSet', (CachedRetrieveMixin,), {'cache_namespace': 'post', 'viewer_fields': ('x',)})
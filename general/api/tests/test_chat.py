@@ -0,0 +1,123 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general.factories import UserFactory, ChatFactory, MessageFactory
+from general.nplusone import NPlusOneTestMixin
+
+
+class ChatMessagesTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.companion = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.chat = ChatFactory(user_1=self.user, user_2=self.companion)
+        self.messages = [
+            MessageFactory(chat=self.chat, author=self.user if i % 2 else self.companion)
+            for i in range(5)
+        ]
+        self.url = f"/api/chats/{self.chat.pk}/messages/"
+
+    def test_messages_latest_window(self):
+        """
+        [get]
+        /api/chats/{pk}/messages/?limit=3
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(path=self.url, data={"limit": 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["has_more"])
+        self.assertEqual([message["id"] for message in response.data["results"]],
+                         [message.pk for message in self.messages[:1:-1]])
+        self.assertEqual(response.data["before"], self.messages[2].pk)
+        self.assertEqual(response.data["after"], self.messages[4].pk)
+        self.assertEqual(response.data["results"][0]["message_author"], self.companion.first_name)
+        self.assertEqual(response.data["results"][1]["message_author"], "Вы")
+
+    def test_messages_before(self):
+        """
+        [get]
+        /api/chats/{pk}/messages/?before={id}
+        """
+        response = self.client.get(path=self.url, data={"before": self.messages[2].pk}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["has_more"])
+        self.assertEqual([message["id"] for message in response.data["results"]],
+                         [self.messages[1].pk, self.messages[0].pk])
+
+    def test_messages_since_last_seen(self):
+        """
+        [get]
+        /api/chats/{pk}/messages/?since={id}
+        """
+        response = self.client.get(path=self.url, data={"since": self.messages[4].pk}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["after"], self.messages[4].pk)
+
+        new_message = MessageFactory(chat=self.chat, author=self.companion)
+        response = self.client.get(path=self.url, data={"since": self.messages[4].pk}, format='json')
+
+        self.assertEqual([message["id"] for message in response.data["results"]], [new_message.pk])
+
+    def test_messages_of_foreign_chat(self):
+        self.client.force_authenticate(user=UserFactory())
+
+        response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ChatListTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/chats/"
+
+    def test_chat_list_ordered_by_last_message(self):
+        """
+        [get]
+        /api/chats/
+        """
+        old_chat = ChatFactory(user_1=self.user)
+        new_chat = ChatFactory(user_2=self.user)
+        ChatFactory(user_1=self.user)
+        MessageFactory(chat=old_chat, author=self.user)
+        MessageFactory(chat=new_chat, author=self.user, content="hello")
+        last_message = MessageFactory(chat=old_chat, author=old_chat.user_2, content="x" * 150)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([chat["id"] for chat in response.data["results"]], [old_chat.pk, new_chat.pk])
+        self.assertEqual(response.data["results"][0]["last_message_content"], "x" * 100)
+        self.assertEqual(response.data["results"][0]["last_message_datetime"],
+                         last_message.created_at.strftime("%Y-%b-%dT%H:%M:%S"))
+        self.assertEqual(response.data["results"][1]["last_message_content"], "hello")
+
+    def test_last_message_deleted(self):
+        """
+        [delete]
+        /api/messages/{pk}/
+        """
+        chat = ChatFactory(user_1=self.user)
+        first_message = MessageFactory(chat=chat, author=self.user)
+        last_message = MessageFactory(chat=chat, author=self.user)
+
+        response = self.client.delete(path=f"/api/messages/{last_message.pk}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        chat.refresh_from_db()
+        self.assertEqual(chat.last_message_id, first_message.pk)
+        self.assertEqual(chat.last_message_preview, first_message.content[:100])
+
+        first_message.delete()
+
+        chat.refresh_from_db()
+        self.assertIsNone(chat.last_message_id)
+        self.assertIsNone(chat.last_message_at)
+        self.assertEqual(chat.last_message_preview, "")
@@ -0,0 +1,40 @@
+from io import StringIO
+from unittest import skipUnless
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from general.factories import UserFactory, PostFactory, ChatFactory
+from general.models import Messages, Reaction
+
+
+@skipUnless(connection.vendor == 'sqlite', 'PRAGMAs are SQLite settings')
+class SqlitePragmasTestCase(TestCase):
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4096, 'busy_timeout': 1234})
+    def test_set_on_new_connections(self):
+        new_connection = connections.create_connection('default')
+        with new_connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(-4096, cursor.fetchone()[0])
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(1234, cursor.fetchone()[0])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'profiles are SQLite settings')
+class BenchmarkWritesTestCase(TransactionTestCase):
+
+    def test_profiles(self):
+        users = UserFactory.create_batch(3)
+        PostFactory.create_batch(3, author=users[0])
+        ChatFactory(user_1=users[0], user_2=users[1])
+        out = StringIO()
+
+        call_command('benchmark_writes', workers=2, writes=5, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(['default', 'production'], [line.split()[0] for line in lines[1:3]])
+        self.assertEqual(['10', '10'], [line.split()[1] for line in lines[1:3]])
+        self.assertIn('x the write throughput of default', lines[3])
+        # the workers wrote to copies
+        self.assertFalse(Messages.objects.exists())
+        self.assertFalse(Reaction.objects.exists())
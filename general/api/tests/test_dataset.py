@@ -0,0 +1,42 @@
+import io
+import random
+from collections import Counter
+from django.core.management import call_command
+from django.test import TestCase
+from general.dataset import preferential_attachment
+from general.models import User, Post, Chat, Messages
+from general.services import reconcile_post_counters
+
+
+class GenerateDatasetTestCase(TestCase):
+
+    def snapshot(self):
+        friendships = User.friends.through.objects.values_list('from_user__username', 'to_user__username')
+        return (sorted(User.objects.values_list('username', 'email')),
+                sorted(friendships),
+                sorted(Post.objects.values_list('author__username', 'title', 'body')),
+                sorted(Messages.objects.values_list('chat__user_1__username', 'author__username', 'content')))
+
+    def test_same_seed_same_dataset(self):
+        options = dict(users=30, seed=7, batch_size=8, stdout=io.StringIO())
+        call_command('generate_dataset', **options)
+        first = self.snapshot()
+
+        self.assertEqual(len(first[0]), 30)
+        self.assertTrue(User.objects.get(username=first[0][0][0]).check_password('password'))
+        self.assertTrue(Chat.objects.filter(last_message__isnull=False).exists())
+        self.assertFalse(any(reconcile_post_counters(Post.objects.all()).values()))
+
+        User.objects.all().delete()
+        call_command('generate_dataset', **options)
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_preferential_attachment(self):
+        edges = preferential_attachment(2000, 3, random.Random(0))
+        degrees = Counter(node for edge in edges for node in edge)
+
+        self.assertEqual(len(edges), len(set(edges)))
+        self.assertTrue(all(degrees[node] >= 3 for node in range(3, 2000)))
+        # hubs: a uniform random graph would top out near 15
+        self.assertGreater(max(degrees.values()), 50)
@@ -0,0 +1,78 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general.factories import UserFactory, PostFactory
+from general.models import TimelineEntry
+from general.nplusone import NPlusOneTestMixin
+
+
+class FeedTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.friend = UserFactory()
+        self.user.friends.add(self.friend)
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/feed/"
+
+    def test_feed_contains_only_friends_posts(self):
+        """
+        [get]
+        /api/feed/
+        """
+        posts = PostFactory.create_batch(12, author=self.friend)
+        PostFactory(author=self.user)
+        PostFactory()
+
+        response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post["id"] for post in response.data["results"]],
+                         [post.pk for post in posts[:1:-1]])
+
+        response = self.client.get(path=response.data["next"], format='json')
+
+        self.assertEqual([post["id"] for post in response.data["results"]],
+                         [posts[1].pk, posts[0].pk])
+        self.assertIsNone(response.data["next"])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_feed_fan_out_on_read(self):
+        """
+        posts of authors with many friends are not copied into timelines
+        """
+        self.friend.friends.add(UserFactory())
+        post = PostFactory(author=self.friend)
+        regular_friend = UserFactory()
+        regular_friend.friends.add(self.user)
+        regular_post = PostFactory(author=regular_friend)
+
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual([post["id"] for post in response.data["results"]],
+                         [regular_post.pk, post.pk])
+
+    def test_friendship_changes_timeline(self):
+        post = PostFactory(author=UserFactory())
+
+        post.author.friends.add(self.user)
+
+        response = self.client.get(path=self.url, format='json')
+        self.assertEqual([post["id"] for post in response.data["results"]], [post.pk])
+
+        self.user.friends.remove(post.author)
+
+        response = self.client.get(path=self.url, format='json')
+        self.assertEqual(response.data["results"], [])
+
+    def test_rebuild_timelines(self):
+        post = PostFactory(author=self.friend)
+        TimelineEntry.objects.all().delete()
+
+        call_command("rebuild_timelines", stdout=StringIO())
+
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.user, post=post).exists())
@@ -0,0 +1,149 @@
+import os
+import tempfile
+from array import array
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general.factories import UserFactory
+from general.graph import FriendGraph, get_graph, reset_graph
+from general.nplusone import NPlusOneTestMixin
+
+
+class FriendSuggestionsTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        reset_graph()
+        self.addCleanup(reset_graph)
+        self.user = UserFactory()
+        self.friends = UserFactory.create_batch(3)
+        self.user.friends.add(*self.friends)
+        self.strangers = UserFactory.create_batch(3)
+        # strangers[0] knows three friends, strangers[1] two, strangers[2] none
+        self.strangers[0].friends.add(*self.friends)
+        self.strangers[1].friends.add(*self.friends[:2])
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/users/suggestions/'
+
+    def test_suggestions_ranked_by_mutual_friends(self):
+        """
+        [get]
+        /api/users/suggestions/
+        """
+        response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(user['id'], user['mutual_friends']) for user in response.data],
+                         [(self.strangers[0].pk, 3), (self.strangers[1].pk, 2)])
+
+        with self.assertNumQueries(1):
+            self.client.get(path=self.url, data={'limit': 1}, format='json')
+
+    def test_suggestions_follow_friend_actions(self):
+        """
+        [post]
+        /api/users/{id}/add/
+        /api/users/{id}/delete/
+        """
+        get_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(path=f'/api/users/{self.strangers[0].pk}/add/')
+        response = self.client.get(path=self.url, format='json')
+        self.assertEqual([user['id'] for user in response.data], [self.strangers[1].pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(path=f'/api/users/{self.friends[0].pk}/delete/')
+        response = self.client.get(path=self.url, format='json')
+        self.assertEqual([(user['id'], user['mutual_friends']) for user in response.data],
+                         [(self.friends[0].pk, 1), (self.strangers[1].pk, 1)])
+
+    def test_snapshot_round_trip(self):
+        graph = FriendGraph.from_db()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'friend_graph.bin')
+            graph.save(path)
+            loaded = FriendGraph.load(path)
+            with override_settings(FRIEND_GRAPH_SNAPSHOT=path), self.assertNumQueries(0):
+                reset_graph()
+                self.assertEqual(get_graph().adjacency, graph.adjacency)
+
+        self.assertEqual(loaded.adjacency, graph.adjacency)
+        self.assertEqual(list(loaded.friends(self.user.pk)), sorted(friend.pk for friend in self.friends))
+
+    def test_truncated_snapshot_rebuilt(self):
+        graph = FriendGraph.from_db()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'friend_graph.bin')
+            graph.save(path)
+            with open(path, 'r+b') as file:
+                file.truncate(os.path.getsize(path) - 8)
+
+            with override_settings(FRIEND_GRAPH_SNAPSHOT=path):
+                reset_graph()
+                self.assertEqual(get_graph().adjacency, graph.adjacency)
+            self.assertEqual(FriendGraph.load(path).adjacency, graph.adjacency)
+            self.assertEqual(os.listdir(directory), ['friend_graph.bin'])
+
+
+class FriendPathTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        reset_graph()
+        self.addCleanup(reset_graph)
+        self.user = UserFactory()
+        self.chain = UserFactory.create_batch(4)
+        previous = self.user
+        for user in self.chain:
+            previous.friends.add(user)
+            previous = user
+        self.client.force_authenticate(user=self.user)
+
+    def test_shortest_path(self):
+        """
+        [get]
+        /api/users/{id}/path/
+        """
+        target = self.chain[-1]
+        response = self.client.get(path=f'/api/users/{target.pk}/path/', format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['distance'], 4)
+        self.assertEqual([user['id'] for user in response.data['path']],
+                         [self.user.pk] + [user.pk for user in self.chain])
+
+        shortcut = UserFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            shortcut.friends.add(self.user, target)
+        response = self.client.get(path=f'/api/users/{target.pk}/path/', format='json')
+
+        self.assertEqual(response.data['distance'], 2)
+        self.assertEqual([user['id'] for user in response.data['path']], [self.user.pk, shortcut.pk, target.pk])
+
+    def test_path_beyond_max_depth(self):
+        """
+        [get]
+        /api/users/{id}/path/?max_depth=3
+        """
+        response = self.client.get(path=f'/api/users/{self.chain[-1].pk}/path/',
+                                   data={'max_depth': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'distance': None, 'path': []})
+
+    def test_bidirectional_search_on_a_grid(self):
+        # 30 x 30 grid, the distance between opposite corners is 58
+        size = 30
+        adjacency = {}
+        for row in range(size):
+            for column in range(size):
+                neighbours = [(row + dr) * size + column + dc
+                              for dr, dc in ((-1, 0), (0, -1), (0, 1), (1, 0))
+                              if 0 <= row + dr < size and 0 <= column + dc < size]
+                adjacency[row * size + column] = array('q', sorted(neighbours))
+        graph = FriendGraph(adjacency)
+
+        path = graph.shortest_path(0, size * size - 1, max_depth=100)
+
+        self.assertEqual(len(path) - 1, 2 * (size - 1))
+        self.assertTrue(all(b in graph.friends(a) for a, b in zip(path, path[1:])))
+        self.assertIsNone(graph.shortest_path(0, size * size - 1, max_depth=57))
+        self.assertEqual(graph.shortest_path(5, 5, max_depth=1), [5])
@@ -0,0 +1,56 @@
+import io
+import json
+import tempfile
+from django.conf import settings
+from django.core.management import call_command, CommandError
+from django.test import TestCase, TransactionTestCase
+from general.importer import iter_json_array
+from general.models import User, Post, Comment, Reaction, TimelineEntry
+
+FIXTURES = [settings.BASE_DIR / 'fixtures' / name for name in ('User.json', 'Post.json', 'Comment.json', 'reac.json')]
+
+
+class ImportFixturesTestCase(TestCase):
+
+    def test_iter_json_array(self):
+        text = ' [1, 22 ,{"a": [1, "]"]},\n"x", 12345] '
+
+        self.assertEqual(list(iter_json_array(io.StringIO(text), read_size=3)),
+                         [1, 22, {"a": [1, "]"]}, "x", 12345])
+        self.assertEqual(list(iter_json_array(io.StringIO('[ ]'))), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[1, 2'), read_size=2))
+
+    def test_import_fixtures(self):
+        out = io.StringIO()
+
+        call_command('import_fixtures', *FIXTURES, batch_size=7, chunk_size=20, stdout=out)
+
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(User.objects.count(), 102)
+        self.assertEqual(Post.objects.count(), 103)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Reaction.objects.count(), 3)
+        edem = User.objects.get(username='edem')
+        self.assertEqual(sorted(edem.friends.values_list('id', flat=True)), [7, 8])
+        self.assertIn(edem, User.objects.get(pk=7).friends.all())
+        post = Post.objects.get(pk=2)
+        self.assertEqual((post.comments_count, post.smile_count), (2, 2))
+        self.assertTrue(TimelineEntry.objects.filter(owner=edem).exists())
+
+    def test_friends_in_later_chunks(self):
+        call_command('import_fixtures', FIXTURES[0], chunk_size=1, skip_derived=True, stdout=io.StringIO())
+
+        edem = User.objects.get(username='edem')
+        self.assertEqual(sorted(edem.friends.values_list('id', flat=True)), [7, 8])
+
+
+class ImportIntegrityTestCase(TransactionTestCase):
+
+    def test_missing_friend(self):
+        user = {'model': 'general.user', 'pk': 1, 'fields': {'username': 'alone', 'password': '', 'friends': [2]}}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump([user], file)
+            file.flush()
+            with self.assertRaises(CommandError):
+                call_command('import_fixtures', file.name, skip_derived=True, stdout=io.StringIO())
@@ -0,0 +1,71 @@
+import json
+import tempfile
+from pathlib import Path
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from general import cache
+from general.factories import UserFactory, ChatFactory, MessageFactory
+from general.metrics import registry
+from general.nplusone import NPlusOneTestMixin
+
+
+class MetricsTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        registry.reset()
+        cache.stats.reset()
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_metrics_per_action(self):
+        """
+        [get]
+        /metrics
+        """
+        chat = ChatFactory(user_1=self.user)
+        MessageFactory(chat=chat, author=self.user)
+        self.client.get(path=f"/api/chats/{chat.pk}/messages/")
+        self.client.get(path=f"/api/chats/{chat.pk}/messages/")
+        self.client.get(path=f"/api/users/{self.user.pk}/")
+
+        response = self.client.get(path="/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        labels = 'view="ChatViewSet",action="messages",method="GET"'
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        # the chat and its messages
+        self.assertIn(f'http_request_sql_queries_bucket{{{labels},le="2"}} 2', text)
+        self.assertIn(f'http_response_size_bytes_count{{{labels}}} 2', text)
+        self.assertIn('view="UserViewSet",action="retrieve",method="GET"', text)
+        self.assertIn('response_cache_requests_total{namespace="user",result="misses"} 1', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(path="/metrics").status_code, 403)
+        self.assertEqual(self.client.get(path="/metrics", HTTP_AUTHORIZATION="Bearer secre").status_code, 403)
+        response = self.client.get(path="/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_processes_are_summed(self):
+        labels = ['PostViewSet', 'list', 'GET']
+        other_process = {
+            'pid': 0,
+            'histograms': {'http_request_duration_seconds': [
+                {'labels': labels, 'buckets': [1] + [0] * 11, 'sum': 0.001, 'count': 1},
+            ]},
+            'cache': {'post': {'hits': 3, 'misses': 1}},
+        }
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            Path(directory, '0.json').write_text(json.dumps(other_process))
+            self.client.get(path="/api/posts/")
+
+            text = self.client.get(path="/metrics").content.decode()
+
+            own_snapshot = json.loads(next(path for path in Path(directory).glob('*.json')
+                                           if path.name != '0.json').read_text())
+
+        self.assertIn('http_request_duration_seconds_count{view="PostViewSet",action="list",method="GET"} 2', text)
+        self.assertIn('response_cache_requests_total{namespace="post",result="hits"} 3', text)
+        self.assertTrue(own_snapshot['histograms']['http_request_duration_seconds'])
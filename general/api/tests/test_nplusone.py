@@ -0,0 +1,68 @@
+from unittest import mock
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general.api.views import CommentsViewSet
+from general.factories import UserFactory, PostFactory, CommentFactory
+from general.models import Comment
+from general.nplusone import NPlusOneTestMixin, NPlusOneDetector, fingerprint
+
+
+class NPlusOneTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.post = PostFactory()
+        CommentFactory.create_batch(6, post=self.post)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT "id" FROM "t"  WHERE "a" = 12 AND "b" = \'x\'\'y\' AND "c" IN (%s, %s, %s)'),
+            'SELECT "id" FROM "t" WHERE "a" = ? AND "b" = ? AND "c" IN (...)',
+        )
+        self.assertEqual(fingerprint('SELECT * FROM "t" WHERE "id" IN (1, 2)'),
+                         fingerprint('SELECT * FROM "t" WHERE "id" IN (3)'))
+        self.assertEqual(fingerprint('SELECT "t1"."id" FROM "t1"'), 'SELECT "t1"."id" FROM "t1"')
+
+    def test_comments_list(self):
+        response = self.client.get('/api/comments/', {'post__id': self.post.pk})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(6, len(response.data['results']))
+
+    def test_report_names_serializer_field(self):
+        queryset = Comment.objects.order_by('-id')
+        with mock.patch.object(CommentsViewSet, 'queryset', queryset), \
+                self.assertRaisesMessage(AssertionError, 'repeated from CommentSerializer.author (5x)'):
+            self.client.get('/api/comments/', {'post__id': self.post.pk})
+
+    def test_threshold(self):
+        with NPlusOneDetector(threshold=7) as detector:
+            list(Comment.objects.all())
+            for comment in Comment.objects.all():
+                comment.author
+        self.assertEqual([], detector.repetitions())
+        self.assertEqual(6, max(detector.counts.values()))
+
+
+class NPlusOneMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(user=UserFactory())
+        self.post = PostFactory()
+        CommentFactory.create_batch(5, post=self.post)
+
+    @override_settings(NPLUSONE_SAMPLE_RATE=1)
+    def test_logs_sampled_requests(self):
+        with mock.patch.object(CommentsViewSet, 'queryset', Comment.objects.order_by('-id')), \
+                self.assertLogs('general.nplusone', 'WARNING') as logs:
+            self.client.get('/api/comments/', {'post__id': self.post.pk})
+        self.assertEqual(1, len(logs.output))
+        self.assertIn('GET /api/comments/', logs.output[0])
+        self.assertIn('CommentSerializer.author', logs.output[0])
+
+    @override_settings(NPLUSONE_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        with mock.patch.object(CommentsViewSet, 'queryset', Comment.objects.order_by('-id')), \
+                self.assertNoLogs('general.nplusone', 'WARNING'):
+            self.client.get('/api/comments/', {'post__id': self.post.pk})
@@ -1,11 +1,16 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
-from general.factories import UserFactory
+from general.factories import UserFactory, PostFactory, ReactionFactory, CommentFactory
 
 from general.models import Post, Reaction
+from general.nplusone import NPlusOneTestMixin
 
 
-class PostTestCase(APITestCase):
+class PostTestCase(NPlusOneTestMixin, APITestCase):
 
     def setUp(self):
         self.user = UserFactory()
@@ -30,3 +35,127 @@ class PostTestCase(APITestCase):
         self.assertEqual(post.body, data["body"])
         self.assertIsNotNone(post.created_at)
 
+    def test_post_list_cursor_pagination(self):
+        """
+        [get]
+        /api/posts/?pagination=cursor
+        """
+        posts = PostFactory.create_batch(15, author=self.user)
+
+        response = self.client.get(path=self.url, data={"pagination": "cursor"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        self.assertEqual([post["id"] for post in response.data["results"]],
+                         [post.pk for post in posts[:10]])
+
+        response = self.client.get(path=response.data["next"], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["next"])
+        self.assertEqual([post["id"] for post in response.data["results"]],
+                         [post.pk for post in posts[10:]])
+
+    def test_post_counters(self):
+        """
+        counters follow reactions and comments without reading them on [get]
+        """
+        post = PostFactory()
+        smile = ReactionFactory(post=post, value=Reaction.Values.SMILE)
+        ReactionFactory(post=post, value=Reaction.Values.HEART)
+        comment = CommentFactory(post=post)
+        CommentFactory(post=post)
+
+        smile.value = Reaction.Values.HEART
+        smile.save()
+        comment.delete()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["comments_count"], 1)
+        self.assertEqual(response.data["results"][0]["reaction_counts"],
+                         {"smile": 0, "thumb_up": 0, "sad": 0, "heart": 2, "laugh": 0})
+
+    def test_reconcile_post_counters(self):
+        post = PostFactory()
+        ReactionFactory(post=post, value=Reaction.Values.SAD)
+        CommentFactory(post=post)
+        Post.objects.update(sad_count=5, comments_count=0)
+
+        call_command("reconcile_post_counters", stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.sad_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_drifted_counters_do_not_fail_writes(self):
+        post = PostFactory()
+        reaction = ReactionFactory(post=post, value=Reaction.Values.SAD)
+        comment = CommentFactory(post=post)
+        Post.objects.update(sad_count=0, comments_count=0)
+
+        reaction.delete()
+        comment.delete()
+
+        post.refresh_from_db()
+        self.assertEqual((post.sad_count, post.comments_count), (0, 0))
+
+    def test_retrieve_post(self):
+        """
+        [get]
+        /api/posts/{pk}/
+        """
+        post = PostFactory()
+        ReactionFactory.create_batch(5, post=post)
+        my_reaction = ReactionFactory(post=post, author=self.user, value=Reaction.Values.LAUGH)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(path=f"{self.url}{post.pk}/", format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["reactions"]), 6)
+        self.assertEqual(response.data["reactions"][-1]["author"],
+                         {"id": self.user.pk, "username": self.user.username})
+        self.assertEqual(response.data["my_reaction"], my_reaction.value)
+        self.assertEqual(response.data["reaction_counts"]["smile"], 5)
+
+    def test_retrieve_post_summary(self):
+        """
+        [get]
+        /api/posts/{pk}/?reactions=summary
+        """
+        post = PostFactory()
+        ReactionFactory.create_batch(3, post=post)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(path=f"{self.url}{post.pk}/", data={"reactions": "summary"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("reactions", response.data)
+        self.assertEqual(response.data["reaction_counts"]["smile"], 3)
+        self.assertEqual(response.data["my_reaction"], "you have not react on this post")
+
+    def test_write_post_without_reactions(self):
+        """
+        [patch, delete]
+        /api/posts/{pk}/
+        """
+        post = PostFactory(author=self.user)
+        ReactionFactory.create_batch(5, post=post)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(path=f"{self.url}{post.pk}/", data={"title": "new"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"id": post.pk, "title": "new", "body": post.body})
+        self.assertFalse([query for query in queries if 'general_reaction' in query['sql']])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(path=f"{self.url}{post.pk}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        # the reactions are only collected for the cascade, without their authors
+        self.assertFalse([query for query in queries if 'general_reaction' in query['sql'] and 'general_user' in query['sql']])
@@ -0,0 +1,115 @@
+import re
+from unittest import skipUnless
+from django.db import connection
+from rest_framework.test import APITestCase
+from general.factories import UserFactory, PostFactory, CommentFactory, ReactionFactory, ChatFactory, MessageFactory
+from general.models import Post
+from general.services import counter_expressions
+
+# GET requests of every viewset: path, query, indexes the plans must use
+ENDPOINTS = [
+    ('/api/users/', {}, ()),
+    ('/api/users/', {'pagination': 'cursor'}, ()),
+    ('/api/users/{friend}/', {}, ('post_author_idx',)),
+    ('/api/users/myself/', {}, ('post_author_idx',)),
+    ('/api/users/{user}/friends/', {}, ()),
+    ('/api/users/{friend}/posts/', {}, ('post_author_idx',)),
+    ('/api/users/suggestions/', {}, ()),
+    ('/api/users/{stranger}/path/', {}, ()),
+    ('/api/posts/', {}, ()),
+    ('/api/posts/{post}/', {}, ('reaction_post_value_idx',)),
+    ('/api/posts/{post}/', {'reactions': 'summary'}, ()),
+    ('/api/feed/', {}, ()),
+    ('/api/search/', {'q': 'post'}, ()),
+    ('/api/comments/', {'post__id': '{post}'}, ('comment_post_idx',)),
+    ('/api/chats/', {}, ('chat_user_1_last_message_idx', 'chat_user_2_last_message_idx')),
+    ('/api/chats/{chat}/messages/', {}, ('messages_chat_idx',)),
+    ('/api/chats/{chat}/messages/', {'before': '{message}'}, ('messages_chat_idx',)),
+]
+# full table scans that are planned on purpose
+ALLOWED_SCANS = {
+    # lists walking the primary key with a LIMIT, and the COUNT(*) of their page
+    '/api/users/': {'general_user'},
+    '/api/posts/': {'general_post'},
+    # the friend graph is loaded with one ordered scan, see general/graph.py
+    '/api/users/suggestions/': {'general_user_friends'},
+    '/api/users/{stranger}/path/': {'general_user_friends'},
+}
+SCAN = re.compile(r'^SCAN (\w+)(?! VIRTUAL TABLE)')
+ALIAS = re.compile(r'"(\w+)" (U\d+)\b')
+
+
+def query_plan(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[3] for row in cursor.fetchall()]
+
+
+def scanned_tables(sql, plan):
+    """
+    Tables read in full by ``plan``, subquery aliases (U0, U1, ...) resolved to their table
+    """
+    aliases = dict((alias, table) for table, alias in ALIAS.findall(sql))
+    tables = connection.introspection.table_names()
+    scanned = set()
+    for detail in plan:
+        match = SCAN.match(detail)
+        if match:
+            table = aliases.get(match[1], match[1])
+            if table in tables:
+                scanned.add(table)
+    return scanned
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are read with EXPLAIN QUERY PLAN of SQLite')
+class QueryPlanTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        friend = UserFactory()
+        stranger = UserFactory()
+        self.user.friends.add(friend)
+        friend.friends.add(stranger)
+        post = PostFactory(author=friend, title='post')
+        CommentFactory(post=post)
+        ReactionFactory(post=post)
+        chat = ChatFactory(user_1=self.user, user_2=friend)
+        message = MessageFactory(chat=chat, author=self.user)
+        self.ids = {'user': self.user.pk, 'friend': friend.pk, 'stranger': stranger.pk,
+                    'post': post.pk, 'chat': chat.pk, 'message': message.pk}
+        self.client.force_authenticate(user=self.user)
+
+    def capture(self, path, data):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.get(path, data)
+        self.assertEqual(200, response.status_code, path)
+        return [(sql, query_plan(sql, params)) for sql, params in queries]
+
+    def test_no_full_table_scans(self):
+        for template, data, indexes in ENDPOINTS:
+            path = template.format_map(self.ids)
+            data = {key: value.format_map(self.ids) for key, value in data.items()}
+            with self.subTest(template, **data):
+                plans = self.capture(path, data)
+                for sql, plan in plans:
+                    scanned = scanned_tables(sql, plan) - ALLOWED_SCANS.get(template, set())
+                    self.assertFalse(scanned, f'full scan of {scanned}: {plan}\n{sql}')
+                used = ' '.join(detail for _, plan in plans for detail in plan)
+                for index in indexes:
+                    self.assertIn(f'INDEX {index} ', used)
+
+    def test_counter_recount(self):
+        expressions = {f'actual_{field}': expression for field, expression in counter_expressions().items()}
+        queryset = Post.objects.annotate(**expressions).filter(pk=self.ids['post'])
+        plan = query_plan(*queryset.query.sql_with_params())
+        details = ' '.join(plan)
+        self.assertIn('USING COVERING INDEX reaction_post_value_idx', details)
+        self.assertIn('USING COVERING INDEX comment_post_idx', details)
+        self.assertFalse(scanned_tables(str(queryset.query), plan))
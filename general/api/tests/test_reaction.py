@@ -0,0 +1,54 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general.factories import UserFactory, PostFactory
+from general.models import Reaction
+from general.nplusone import NPlusOneTestMixin
+
+
+class ReactionTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.post = PostFactory()
+        self.url = "/api/reactions/"
+
+    def react(self, value):
+        return self.client.post(path=self.url, data={"post": self.post.pk, "value": value}, format='json')
+
+    def test_toggle_reaction(self):
+        """
+        [post]
+        /api/reactions/
+        """
+        response = self.react(Reaction.Values.SMILE)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["value"], Reaction.Values.SMILE)
+        self.assertEqual(response.data["post"], self.post.pk)
+        self.assertIsNotNone(response.data["created_at"])
+        reaction_id = response.data["id"]
+
+        response = self.react(Reaction.Values.HEART)
+
+        self.assertEqual(response.data["id"], reaction_id)
+        self.assertEqual(response.data["value"], Reaction.Values.HEART)
+
+        response = self.react(Reaction.Values.HEART)
+
+        self.assertEqual(response.data["id"], reaction_id)
+        self.assertIsNone(response.data["value"])
+        self.assertEqual(Reaction.objects.filter(author=self.user, post=self.post).count(), 1)
+
+    def test_toggle_reaction_counters(self):
+        self.react(Reaction.Values.SMILE)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.smile_count, 1)
+
+        self.react(Reaction.Values.LAUGH)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.smile_count, self.post.laugh_count), (0, 1))
+
+        self.react(Reaction.Values.LAUGH)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.smile_count, self.post.laugh_count), (0, 0))
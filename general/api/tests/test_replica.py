@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command, CommandError
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from general import cache
+from general.factories import UserFactory
+from general.models import User
+from general.replica import ReplicaMiddleware, ReplicaRouter, PIN_COOKIE
+
+
+class ReplicaRoutingTestCase(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = UserFactory()
+        self.token = f'Bearer {AccessToken.for_user(self.user)}'
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].clear()
+        cache.get_cache().clear()
+        # the alias is only named by the router, the views below do not query it
+        replica = mock.patch('general.replica.replica_enabled', return_value=True)
+        replica.start()
+        self.addCleanup(replica.stop)
+
+    def route(self, request):
+        """
+        :return: alias reads of ``request`` went to and the response
+        """
+        aliases = []
+
+        def view(request):
+            aliases.append(ReplicaRouter().db_for_read(User))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return aliases[0], response
+
+    def test_safe_methods_read_from_replica(self):
+        for method in ('get', 'head', 'options'):
+            alias, response = self.route(getattr(self.factory, method)('/api/posts/'))
+            self.assertEqual('replica', alias)
+            self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        alias, response = self.route(self.factory.post('/api/posts/', HTTP_AUTHORIZATION=self.token))
+        self.assertEqual('default', alias)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(settings.REPLICA_STICKY_SECONDS, response.cookies[PIN_COOKIE]['max-age'])
+        self.assertEqual('default', ReplicaRouter().db_for_write(User))
+
+    def test_user_pinned_after_write(self):
+        self.route(self.factory.post('/api/users/2/add/', HTTP_AUTHORIZATION=self.token))
+
+        # no cookie: recognized by the token
+        alias, _ = self.route(self.factory.get('/api/users/myself/', HTTP_AUTHORIZATION=self.token))
+        self.assertEqual('default', alias)
+        other = f'Bearer {AccessToken.for_user(UserFactory())}'
+        alias, _ = self.route(self.factory.get('/api/users/myself/', HTTP_AUTHORIZATION=other))
+        self.assertEqual('replica', alias)
+        alias, _ = self.route(self.factory.get('/api/users/myself/', HTTP_AUTHORIZATION='Bearer invalid'))
+        self.assertEqual('replica', alias)
+
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].clear()
+        alias, _ = self.route(self.factory.get('/api/users/myself/', HTTP_AUTHORIZATION=self.token))
+        self.assertEqual('replica', alias)
+
+    def test_cached_bodies_built_from_primary(self):
+        aliases = []
+
+        def view(request):
+            aliases.append(ReplicaRouter().db_for_read(User))
+            cache.get_or_build('post', 1, lambda: aliases.append(ReplicaRouter().db_for_read(User)) or {})
+            aliases.append(ReplicaRouter().db_for_read(User))
+            return HttpResponse()
+
+        ReplicaMiddleware(view)(self.factory.get('/api/posts/1/'))
+        self.assertEqual(['replica', 'default', 'replica'], aliases)
+
+    def test_client_pinned_by_cookie(self):
+        request = self.factory.get('/api/posts/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        alias, _ = self.route(request)
+        self.assertEqual('default', alias)
+
+    @mock.patch('general.replica.replica_enabled', return_value=False)
+    def test_without_replica(self, replica_enabled):
+        alias, response = self.route(self.factory.get('/api/posts/'))
+        self.assertEqual('default', alias)
+        _, response = self.route(self.factory.post('/api/posts/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class SyncReplicaTestCase(TestCase):
+
+    def test_copies_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with sqlite3.connect(source) as connection:
+                connection.execute('PRAGMA journal_mode = WAL')
+                connection.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+                connection.executemany('INSERT INTO item VALUES (?)', [(1,), (2,)])
+            connection.close()
+
+            call_command('sync_replica', source=source, target=target, stdout=StringIO())
+
+            connection = sqlite3.connect(target)
+            self.assertEqual([(1,), (2,)], connection.execute('SELECT id FROM item').fetchall())
+            self.assertEqual(('delete',), connection.execute('PRAGMA journal_mode').fetchone())
+            connection.close()
+            self.assertEqual(sorted(os.listdir(directory)), ['primary.sqlite3', 'replica.sqlite3'])
+
+    @mock.patch.dict(settings.DATABASES)
+    def test_requires_replica(self):
+        settings.DATABASES.pop('replica', None)
+        with self.assertRaisesMessage(CommandError, 'DATABASE_REPLICA_NAME'):
+            call_command('sync_replica', source='primary.sqlite3', stdout=StringIO())
@@ -0,0 +1,69 @@
+import gzip
+import json
+import shutil
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+
+class SchemaViewTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        call_command('build_schema', output_dir=cls.directory, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        schema_dir = override_settings(OPENAPI_SCHEMA_DIR=self.directory)
+        schema_dir.enable()
+        self.addCleanup(schema_dir.disable)
+
+    def test_served_with_etag(self):
+        response = self.client.get('/api/schema/')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/vnd.oai.openapi; charset=utf-8', response['Content-Type'])
+        self.assertTrue(response.content.startswith(b'openapi:'))
+        self.assertEqual('no-cache', response['Cache-Control'])
+        self.assertEqual('Accept, Accept-Encoding', response['Vary'])
+
+        response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+        response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(405, self.client.post('/api/schema/').status_code)
+
+    def test_json(self):
+        yaml_etag = self.client.get('/api/schema/')['ETag']
+        for headers in ({'data': {'format': 'json'}}, {'HTTP_ACCEPT': 'application/json'}):
+            response = self.client.get('/api/schema/', **headers)
+            self.assertEqual('application/vnd.oai.openapi+json', response['Content-Type'])
+            self.assertIn('/api/posts/', json.loads(response.content)['paths'])
+            self.assertNotEqual(yaml_etag, response['ETag'])
+
+    def test_gzip(self):
+        plain = self.client.get('/api/schema/')
+        response = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual('gzip', response['Content-Encoding'])
+        self.assertEqual(plain.content, gzip.decompress(response.content))
+        self.assertNotEqual(plain['ETag'], response['ETag'])
+        response = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, response.status_code)
+
+    def test_not_built(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(OPENAPI_SCHEMA_DIR=directory):
+            response = self.client.get('/api/schema/')
+            self.assertEqual(503, response.status_code)
+            self.assertIn(b'build_schema', response.content)
+
+            with override_settings(DJANGO_ENV='dev'):
+                response = self.client.get('/api/schema/')
+            self.assertEqual(200, response.status_code)
+            self.assertNotIn('ETag', response)
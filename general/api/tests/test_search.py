@@ -0,0 +1,72 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+from general.factories import UserFactory, PostFactory, CommentFactory
+from general.nplusone import NPlusOneTestMixin
+
+
+class SearchTestCase(NPlusOneTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.url = "/api/search/"
+
+    def test_search_ranks_posts_and_comments(self):
+        """
+        [get]
+        /api/search/?q=
+        """
+        title_match = PostFactory(title="Звезды", body="ночь")
+        body_match = PostFactory(title="небо", body="под куполом сверкали звезды")
+        comment = CommentFactory(body="красивые звездочки")
+        PostFactory(title="other", body="nothing")
+
+        response = self.client.get(path=self.url, data={"q": "ЗВЕЗД"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = [(result["type"], result["id"]) for result in response.data["results"]]
+        self.assertEqual(results[0], ("post", title_match.pk))
+        self.assertCountEqual(results[1:], [("post", body_match.pk), ("comment", comment.pk)])
+        self.assertIn("<mark>", response.data["results"][0]["snippet"])
+        comment_result = response.data["results"][results.index(("comment", comment.pk))]
+        self.assertEqual(comment_result["post"], comment.post_id)
+        self.assertEqual(comment_result["author"]["id"], comment.author_id)
+
+    def test_search_cursor_pagination(self):
+        posts = [PostFactory(title=f"python {i}", body="text") for i in range(5)]
+
+        response = self.client.get(path=self.url, data={"q": "pyth", "type": "posts", "limit": 3}, format='json')
+        first_page = [result["id"] for result in response.data["results"]]
+
+        response = self.client.get(path=response.data["next"], format='json')
+        second_page = [result["id"] for result in response.data["results"]]
+
+        self.assertEqual(len(first_page), 3)
+        self.assertIsNone(response.data["next"])
+        self.assertCountEqual(first_page + second_page, [post.pk for post in posts])
+
+    def test_search_follows_updates(self):
+        post = PostFactory(title="draft", body="text")
+        post.title = "release"
+        post.save()
+
+        response = self.client.get(path=self.url, data={"q": "draft"}, format='json')
+        self.assertEqual(response.data["results"], [])
+
+        response = self.client.get(path=self.url, data={"q": "release"}, format='json')
+        self.assertEqual([result["id"] for result in response.data["results"]], [post.pk])
+
+    def test_search_requires_query(self):
+        response = self.client.get(path=self.url, data={"q": " "}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_snippet_escapes_user_html(self):
+        PostFactory(title="probe", body='<img src=x onerror=alert(1)> xssprobe & more')
+
+        response = self.client.get(path=self.url, data={"q": "xssprobe"}, format='json')
+
+        snippet = response.data["results"][0]["snippet"]
+        self.assertIn("<mark>xssprobe</mark>", snippet)
+        self.assertIn("&lt;img src=x onerror=alert(1)&gt;", snippet)
+        self.assertNotIn("<img", snippet)
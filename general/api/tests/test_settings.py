@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.test import SimpleTestCase
+
+SHOW_SETTINGS = '''
+import json
+from config import settings
+print(json.dumps({"DEBUG": settings.DEBUG, "DJANGO_ENV": settings.DJANGO_ENV,
+                  "toolbar": "debug_toolbar" in settings.INSTALLED_APPS,
+                  "DATABASE_PROFILE": settings.DATABASE_PROFILE}))
+'''
+
+
+class SettingsProfileTestCase(SimpleTestCase):
+
+    def load(self, **env):
+        """
+        Settings of a fresh interpreter started with ``env``
+        """
+        environ = {key: value for key, value in os.environ.items() if key not in ('DJANGO_ENV', 'DJANGO_DEBUG')}
+        environ['METRICS_TOKEN'] = 'secret'
+        process = subprocess.run([sys.executable, '-c', SHOW_SETTINGS], env={**environ, **env}, cwd=settings.BASE_DIR,
+                                 capture_output=True, text=True)
+        if process.returncode:
+            return process.stderr
+        return json.loads(process.stdout)
+
+    def test_profiles(self):
+        self.assertEqual({'DEBUG': True, 'DJANGO_ENV': 'dev', 'toolbar': True, 'DATABASE_PROFILE': 'default'},
+                         self.load())
+        self.assertEqual({'DEBUG': False, 'DJANGO_ENV': 'prod', 'toolbar': False, 'DATABASE_PROFILE': 'production'},
+                         self.load(DJANGO_ENV='prod'))
+        self.assertEqual({'DEBUG': False, 'DJANGO_ENV': 'test', 'toolbar': False, 'DATABASE_PROFILE': 'default'},
+                         self.load(DJANGO_ENV='test'))
+        self.assertEqual('test', settings.DJANGO_ENV)
+        self.assertNotIn('debug_toolbar', settings.INSTALLED_APPS)
+
+    def test_prod_refuses_debug(self):
+        self.assertIn('ImproperlyConfigured: DEBUG must be off', self.load(DJANGO_ENV='prod', DJANGO_DEBUG='1'))
+        self.assertEqual(False, self.load(DJANGO_ENV='prod', DJANGO_DEBUG='0')['DEBUG'])
+
+    def test_prod_requires_metrics_token(self):
+        self.assertIn('ImproperlyConfigured: METRICS_TOKEN must be set', self.load(DJANGO_ENV='prod', METRICS_TOKEN=''))
+        self.assertEqual('dev', self.load(METRICS_TOKEN='')['DJANGO_ENV'])
+
+    def test_unknown_profile(self):
+        self.assertIn('DJANGO_ENV must be', self.load(DJANGO_ENV='production'))
+
+    def test_replica_not_persistent(self):
+        show = ('from config import settings; '
+                'print([settings.DATABASES[alias].get("CONN_MAX_AGE", 0) for alias in ("default", "replica")])')
+        environ = {key: value for key, value in os.environ.items() if key not in ('DJANGO_ENV', 'DJANGO_DEBUG')}
+        process = subprocess.run([sys.executable, '-c', show], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                                 env={**environ, 'DJANGO_ENV': 'prod', 'DATABASE_REPLICA_NAME': 'replica.sqlite3',
+                                      'METRICS_TOKEN': 'secret'})
+        self.assertEqual('[600, 0]', process.stdout.strip())
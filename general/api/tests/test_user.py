@@ -1,11 +1,15 @@
+from unittest import mock
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 from general.factories import UserFactory, PostFactory, MessageFactory, ChatFactory
 from django.contrib.auth.hashers import check_password
+from general.api import serializers
 from general.models import User
+from general.nplusone import NPlusOneTestMixin
 
 
-class UserTestCase(APITestCase):
+class UserTestCase(NPlusOneTestMixin, APITestCase):
 
     def setUp(self):
 
@@ -27,7 +31,8 @@ class UserTestCase(APITestCase):
             'username': self.user.username,
             'first_name': self.user.first_name,
             'last_name': self.user.last_name,
-            'is_friend': False
+            'is_friend': False,
+            'mutual_friend_count': 0
         }
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -40,7 +45,7 @@ class UserTestCase(APITestCase):
         self.user.friends.add(user_2)
         self.user.save()
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(4):
             response = self.client.get(path=self.url, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -48,6 +53,50 @@ class UserTestCase(APITestCase):
         self.assertTrue(response.data["results"][1]['is_friend'])
         self.assertFalse(response.data["results"][2]["is_friend"])
 
+    def test_is_friend_queries_do_not_depend_on_friend_count(self):
+        others = UserFactory.create_batch(5)
+        users = UserFactory.create_batch(10)
+        self.user.friends.add(*users[:5])
+        for user in users:
+            user.friends.add(*others)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        is_friend = {user["id"]: user["is_friend"] for user in response.data["results"]}
+        self.assertEqual(is_friend, {user.pk: user in users[:5] for user in users})
+
+    def test_mutual_friend_count(self):
+        friends = UserFactory.create_batch(3)
+        self.user.friends.add(*friends)
+        users = UserFactory.create_batch(10)
+        for count, user in enumerate(users[:4]):
+            user.friends.add(*friends[:count])
+
+        with self.assertNumQueries(4):
+            response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mutual = {user["id"]: user["mutual_friend_count"] for user in response.data["results"]}
+        self.assertEqual(mutual, {user.pk: index if index < 4 else 0 for index, user in enumerate(users)})
+
+        response = self.client.get(path=f"{self.url}{users[3].pk}/", format='json')
+        self.assertEqual(response.data["mutual_friend_count"], 3)
+        self.client.force_authenticate(user=friends[0])
+        response = self.client.get(path=f"{self.url}{users[3].pk}/", format='json')
+        self.assertEqual(response.data["mutual_friend_count"], 0)
+
+    def test_mutual_friend_counts_once_per_page(self):
+        UserFactory.create_batch(10)
+
+        with mock.patch.object(serializers, 'get_mutual_friend_counts',
+                               wraps=serializers.get_mutual_friend_counts) as get_counts:
+            response = self.client.get(path=self.url, format='json')
+
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(get_counts.call_count, 1)
+
     def test_correct_registration(self):
         """
         [post]
@@ -161,19 +210,23 @@ class UserTestCase(APITestCase):
                          "first_name": user.first_name,
                          "last_name": user.last_name,
                          "is_friend": False,
+                         "mutual_friend_count": 0,
                          "friend_count": 2,
-                         "posts": [{"id": post_1.pk,
-                                    "body": post_1.body,
-                                    "created_at": post_1.created_at.strftime("%Y-%b-%dT%H:%M:%S"),
-                                    "title": post_1.title},
-                                   {"id": post_2.pk,
+                         "post_count": 2,
+                         "posts": [{"id": post_2.pk,
                                     "body": post_2.body,
                                     "created_at": post_2.created_at.strftime("%Y-%b-%dT%H:%M:%S"),
-                                    "title": post_2.title}],
-                         "friends": [{"id": friend_1.pk,
-                                      "username": friend_1.username},
-                                     {"id": friend_2.pk,
-                                      "username": friend_2.username}]}
+                                    "title": post_2.title},
+                                   {"id": post_1.pk,
+                                    "body": post_1.body,
+                                    "created_at": post_1.created_at.strftime("%Y-%b-%dT%H:%M:%S"),
+                                    "title": post_1.title}],
+                         "posts_next": None,
+                         "friends": [{"id": friend_2.pk,
+                                      "username": friend_2.username},
+                                     {"id": friend_1.pk,
+                                      "username": friend_1.username}],
+                         "friends_next": None}
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(response.data, expected_data)
@@ -210,13 +263,15 @@ class UserTestCase(APITestCase):
                 "username": friend_2.username,
                 "first_name": friend_2.first_name,
                 "last_name": friend_2.last_name,
-                "is_friend": friend_2 in self.user.friends.all()},
+                "is_friend": friend_2 in self.user.friends.all(),
+                "mutual_friend_count": 0},
             {
                 "id": friend_1.pk,
                 "username": friend_1.username,
                 "first_name": friend_1.first_name,
                 "last_name": friend_1.last_name,
-                "is_friend": friend_1 in self.user.friends.all()
+                "is_friend": friend_1 in self.user.friends.all(),
+                "mutual_friend_count": 0
             }
         ]}
 
@@ -250,18 +305,78 @@ class UserTestCase(APITestCase):
                          "first_name": user.first_name,
                          "last_name": user.last_name,
                          "is_friend": False,
+                         "mutual_friend_count": 0,
                          "friend_count": 2,
-                         "posts": [{"id": post_1.pk,
-                                    "body": post_1.body,
-                                    "created_at": post_1.created_at.strftime("%Y-%b-%dT%H:%M:%S"),
-                                    "title": post_1.title},
-                                   {"id": post_2.pk,
+                         "post_count": 2,
+                         "posts": [{"id": post_2.pk,
                                     "body": post_2.body,
                                     "created_at": post_2.created_at.strftime("%Y-%b-%dT%H:%M:%S"),
-                                    "title": post_2.title}],
-                         "friends": [{"id": friend_1.pk,
-                                      "username": friend_1.username},
-                                     {"id": friend_2.pk,
-                                      "username": friend_2.username}]}
+                                    "title": post_2.title},
+                                   {"id": post_1.pk,
+                                    "body": post_1.body,
+                                    "created_at": post_1.created_at.strftime("%Y-%b-%dT%H:%M:%S"),
+                                    "title": post_1.title}],
+                         "posts_next": None,
+                         "friends": [{"id": friend_2.pk,
+                                      "username": friend_2.username},
+                                     {"id": friend_1.pk,
+                                      "username": friend_1.username}],
+                         "friends_next": None}
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(response.data, expected_data)
+
+    def test_user_list_cursor_pagination(self):
+        """
+        [get]
+        /api/users/?pagination=cursor
+        """
+        UserFactory.create_batch(20)
+
+        response = self.client.get(path=self.url, data={"pagination": "cursor"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIn("pagination=cursor", response.data["next"])
+        self.assertEqual(response.data["results"][0]["id"], User.objects.order_by('-id').first().pk)
+
+    @override_settings(PROFILE_PREVIEW_SIZE=2)
+    def test_retrieve_user_previews_are_capped(self):
+        """
+        [get]
+        /api/users/{pk}
+        """
+        user = UserFactory()
+        posts = PostFactory.create_batch(3, author=user)
+        friends = UserFactory.create_batch(3)
+        user.friends.add(*friends)
+
+        with self.assertNumQueries(5):
+            response = self.client.get(path=f"{self.url}{user.pk}/", format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["post_count"], 3)
+        self.assertEqual(response.data["friend_count"], 3)
+        self.assertEqual([post["id"] for post in response.data["posts"]], [posts[2].pk, posts[1].pk])
+        self.assertEqual([friend["id"] for friend in response.data["friends"]], [friends[2].pk, friends[1].pk])
+
+        posts_page = self.client.get(path=response.data["posts_next"], format='json')
+        friends_page = self.client.get(path=response.data["friends_next"], format='json')
+
+        self.assertEqual([post["id"] for post in posts_page.data["results"]], [posts[0].pk])
+        self.assertEqual([friend["id"] for friend in friends_page.data["results"]], [friends[0].pk])
+
+    def test_user_posts(self):
+        """
+        [get]
+        /api/users/{pk}/posts/
+        """
+        user = UserFactory()
+        posts = PostFactory.create_batch(2, author=user)
+        PostFactory()
+
+        response = self.client.get(path=f"{self.url}{user.pk}/posts/", format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual([post["id"] for post in response.data["results"]], [posts[1].pk, posts[0].pk])
@@ -1,12 +1,14 @@
 from rest_framework.routers import SimpleRouter
 from .views import UserViewSet, PostViewSet, CommentsViewSet, ReactionViewSet,\
-    ChatViewSet, MessageViewSet
+    ChatViewSet, MessageViewSet, FeedViewSet, SearchViewSet
 
 
 router = SimpleRouter()
 router.register(r'comments', CommentsViewSet, basename='comments')
 router.register(r'users', UserViewSet, basename='users')
 router.register(r'posts', PostViewSet, basename='posts')
+router.register(r'feed', FeedViewSet, basename='feed')
+router.register(r'search', SearchViewSet, basename='search')
 router.register(r'reactions', ReactionViewSet, basename='reactions')
 router.register(r'chats', ChatViewSet, basename="chats")
 router.register(r'messages', MessageViewSet, basename="messages")
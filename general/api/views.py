@@ -1,27 +1,56 @@
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from rest_framework.mixins import CreateModelMixin, ListModelMixin,\
     RetrieveModelMixin, DestroyModelMixin
 from .serializers import UserRegistrationSerializer, UserListSerializer, UserRetrieveSerializer, \
-    PostListSerializer, PostCreateUpdateSerializer, PostRetrieveSerializer, CommentSerializer, \
-    ReactionSerializer, ChatSerializer, MessageListSerializer, ChatListSerializer, MessageSerializer
+    PostListSerializer, PostCreateUpdateSerializer, PostRetrieveSerializer, PostSummarySerializer, \
+    CommentSerializer, ReactionSerializer, ChatSerializer, MessageListSerializer, ChatListSerializer, MessageSerializer, \
+    SearchResultSerializer, UserSuggestionSerializer, FriendPathSerializer, get_friend_ids, \
+    get_mutual_friend_counts, BulkReactionSerializer, BulkCommentSerializer
 from general.models import User, Post, Reaction, Comment, Messages, Chat
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
 from general.permissions import IsOwnerOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Case, When, Value, F, CharField, OuterRef, Subquery, Q
+from django.conf import settings
+from django.db.models import Q, Prefetch, OuterRef, Subquery
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiTypes
+from general.feed import Feed
+from general.search import Search
+from general.graph import get_graph
+from general.services import count_subquery, bulk_toggle_reactions, bulk_create_comments
+from .mixins import CachedRetrieveMixin, BulkCreateMixin
+from .pagination import PostPagination, CommentPagination, UserPagination, MessageHistoryPagination, \
+    FeedPagination, UserPostsPagination, SearchPagination
 
 
 class UserViewSet(
+        CachedRetrieveMixin,
         GenericViewSet,
         CreateModelMixin,
         ListModelMixin,
         RetrieveModelMixin):
+    pagination_class = UserPagination
+    cache_namespace = 'user'
+    viewer_fields = ('is_friend', 'mutual_friend_count')
+    link_fields = ('posts_next', 'friends_next')
 
     def get_queryset(self):
-        queryset = User.objects.all().prefetch_related('friends').order_by('-id')
+        queryset = User.objects.all().order_by('-id')
+        if self.action in ['retrieve', 'me']:
+            preview_size = settings.PROFILE_PREVIEW_SIZE
+            queryset = queryset.annotate(
+                friend_count=count_subquery(User.friends.through.objects.all(), 'from_user'),
+                post_count=count_subquery(Post.objects.all(), 'author'),
+            ).prefetch_related(
+                Prefetch('posts',
+                         queryset=Post.objects.order_by('-id')[:preview_size],
+                         to_attr='latest_posts'),
+                Prefetch('friends',
+                         queryset=User.objects.order_by('-id')[:preview_size],
+                         to_attr='friends_preview'),
+            )
         return queryset
 
     def get_serializer_class(self):
@@ -29,6 +58,12 @@ class UserViewSet(
             return UserRegistrationSerializer
         if self.action in ['retrieve', 'me']:
             return UserRetrieveSerializer
+        if self.action == 'posts':
+            return PostListSerializer
+        if self.action == 'suggestions':
+            return UserSuggestionSerializer
+        if self.action == 'path':
+            return FriendPathSerializer
         return UserListSerializer
 
     def get_permissions(self):
@@ -46,9 +81,16 @@ class UserViewSet(
         :param request:
         :return:
         """
-        instance = self.request.user
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        pk = self.request.user.pk
+        return self.cached_response(pk, lambda: self.get_queryset().get(pk=pk))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(self.get_cache_pk(), self.get_object)
+
+    def get_viewer_data(self, pk):
+        pk = int(pk)
+        return {'is_friend': pk in get_friend_ids(self.request),
+                'mutual_friend_count': get_mutual_friend_counts(self.request, [pk])[pk]}
 
     @action(detail=True, methods=['get'], url_path='friends')
     def friends(self, request, pk=None):
@@ -70,6 +112,80 @@ class UserViewSet(
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='posts', pagination_class=UserPostsPagination)
+    def posts(self, request, pk=None):
+        """
+        Method shows posts of the user, newest first
+
+        :param request:
+        :param pk:
+        :return:
+        """
+        user = self.get_object()
+        queryset = Post.objects.filter(author=user).select_related('author').order_by('-id')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(parameters=[
+        OpenApiParameter('limit', int, description='number of suggestions, '
+                                                   f'at most {settings.FRIEND_SUGGESTIONS_LIMIT}'),
+    ])
+    @action(detail=False, methods=['get'], url_path='suggestions', pagination_class=None)
+    def suggestions(self, request):
+        """
+        method shows users you may know, ranked by number of mutual friends
+
+        :param request:
+        :return:
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.FRIEND_SUGGESTIONS_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'must be an integer'})
+        limit = max(1, min(limit, settings.FRIEND_SUGGESTIONS_LIMIT))
+        ranked = get_graph().suggestions(request.user.pk, limit)
+        users = User.objects.in_bulk([user_id for user_id, _ in ranked])
+        suggested = []
+        for user_id, mutual_friends in ranked:
+            user = users.get(user_id)
+            if user is not None:
+                user.mutual_friends = mutual_friends
+                suggested.append(user)
+        serializer = self.get_serializer(suggested, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(parameters=[
+        OpenApiParameter('max_depth', int, description='longest chain looked for, '
+                                                       f'at most {settings.FRIEND_PATH_MAX_DEPTH}'),
+    ])
+    @action(detail=True, methods=['get'], url_path='path', pagination_class=None)
+    def path(self, request, pk=None):
+        """
+        method shows the shortest chain of friends between you and the user
+
+        :param request:
+        :param pk:
+        :return:
+        """
+        target = self.get_object()
+        try:
+            max_depth = int(request.query_params.get('max_depth', settings.FRIEND_PATH_MAX_DEPTH))
+        except ValueError:
+            raise ValidationError({'max_depth': 'must be an integer'})
+        max_depth = max(1, min(max_depth, settings.FRIEND_PATH_MAX_DEPTH))
+        path = get_graph().shortest_path(request.user.pk, target.pk, max_depth) or []
+        users = User.objects.in_bulk(path)
+        serializer = self.get_serializer({
+            'distance': len(path) - 1 if path else None,
+            'path': [users[user_id] for user_id in path if user_id in users],
+        })
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'], url_path='add')
     def add_to_friend_list(self, request, pk=None):
         """
@@ -90,21 +206,53 @@ class UserViewSet(
         return Response(f'{user.username} was deleted from your friends list')
 
 
-class PostViewSet(ModelViewSet):
+class PostViewSet(CachedRetrieveMixin, ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = PostPagination
+    cache_namespace = 'post'
+    viewer_fields = ('my_reaction',)
+
+    def is_summary(self):
+        return self.request.query_params.get('reactions') == 'summary'
 
     def get_queryset(self):
-        queryset = Post.objects.all().prefetch_related('reactions').order_by('id')
+        queryset = Post.objects.all().select_related('author').order_by('id')
+        if self.action == 'retrieve':
+            queryset = queryset.annotate(
+                my_reaction_value=Subquery(
+                    Reaction.objects.filter(post=OuterRef('pk'), author_id=self.request.user.pk).values('value')[:1]
+                )
+            )
+            if not self.is_summary():
+                queryset = queryset.prefetch_related(
+                    Prefetch('reactions', queryset=Reaction.objects.select_related('author').order_by('id'))
+                )
         return queryset
 
     def get_serializer_class(self):
-        if self.action in ['create', 'update']:
+        if self.action in ['create', 'update', 'partial_update']:
             return PostCreateUpdateSerializer
         elif self.action == 'list':
             return PostListSerializer
+        elif self.is_summary():
+            return PostSummarySerializer
         else:
             return PostRetrieveSerializer
 
+    @extend_schema(parameters=[
+        OpenApiParameter('reactions', str, enum=['summary'],
+                         description='"summary" returns reaction totals instead of the list of reactions'),
+    ])
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(self.get_cache_pk(), self.get_object)
+
+    def get_cache_variant(self):
+        return '-summary' if self.is_summary() else ''
+
+    def get_viewer_data(self, pk):
+        value = Reaction.objects.filter(post_id=pk, author_id=self.request.user.pk).values_list('value', flat=True).first()
+        return {'my_reaction': PostRetrieveSerializer.describe_reaction(value)}
+
     def get_permissions(self):
         if self.action in ['update', 'destroy', 'partial_update']:
             self.permission_classes = (IsOwnerOrReadOnly,)
@@ -122,27 +270,83 @@ class PostViewSet(ModelViewSet):
     #     serializer.save()
 
 
+class FeedViewSet(GenericViewSet, ListModelMixin):
+    """
+    Home feed: posts of your friends, newest first
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = PostListSerializer
+    pagination_class = FeedPagination
+    filter_backends = ()
+
+    def get_queryset(self):
+        return Feed(self.request.user)
+
+
+class SearchViewSet(GenericViewSet, ListModelMixin):
+    """
+    Full-text search over posts and comments, most relevant first
+
+    every word of `q` is matched as a prefix, `type` limits results to posts or comments
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = SearchResultSerializer
+    pagination_class = SearchPagination
+    filter_backends = ()
+    kinds = {'all': ('post', 'comment'), 'posts': ('post',), 'comments': ('comment',)}
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        kind = self.request.query_params.get('type', 'all')
+        if kind not in self.kinds:
+            raise ValidationError({'type': f'Must be one of: {", ".join(self.kinds)}.'})
+        return Search(text, self.kinds[kind])
+
+    @extend_schema(parameters=[
+        OpenApiParameter('q', str, required=True, description='Words to search for'),
+        OpenApiParameter('type', str, enum=['all', 'posts', 'comments']),
+    ])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+@extend_schema_view(bulk=extend_schema(request=BulkCommentSerializer(many=True), responses=OpenApiTypes.OBJECT))
 class CommentsViewSet(
+        BulkCreateMixin,
         GenericViewSet,
         CreateModelMixin,
         ListModelMixin,
         DestroyModelMixin):
-    queryset = Comment.objects.all().order_by('-id')
+    queryset = Comment.objects.select_related('author').order_by('-id')
     serializer_class = CommentSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = CommentPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_fields = ('post__id',)
+    bulk_serializer_class = BulkCommentSerializer
 
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
             raise PermissionError('this action not allowed')
         instance.delete()
 
+    def perform_bulk_create(self, items):
+        comments = bulk_create_comments(self.request.user, [(item['post'], item['body']) for item in items])
+        return [{'id': comment.pk, 'post': comment.post_id} for comment in comments]
+
 
-class ReactionViewSet(GenericViewSet, CreateModelMixin):
+@extend_schema_view(bulk=extend_schema(request=BulkReactionSerializer(many=True), responses=OpenApiTypes.OBJECT))
+class ReactionViewSet(BulkCreateMixin, GenericViewSet, CreateModelMixin):
     queryset = Reaction.objects.all()
     permission_classes = (IsAuthenticated,)
     serializer_class = ReactionSerializer
+    bulk_serializer_class = BulkReactionSerializer
+
+    def perform_bulk_create(self, items):
+        values = bulk_toggle_reactions(self.request.user, [(item['post'], item['value']) for item in items])
+        return [{'post': item['post'], 'value': value} for item, value in zip(items, values)]
 
 
 class ChatViewSet(
@@ -160,37 +364,29 @@ class ChatViewSet(
 
     def get_queryset(self):
         user = self.request.user
-
-        last_message_subquery = Messages.objects.filter(
-            chat=OuterRef('pk')
-        ).order_by('-created_at').values('created_at')[:1]
-        last_message_content_subquery = Messages.objects.filter(
-            chat=OuterRef('pk')
-        ).order_by('-created_at').values('content')[:1]
-
         qs = Chat.objects.filter(
             Q(user_1=user) | Q(user_2=user),
-            messages__isnull=False,
-        ).annotate(
-            last_message_datetime=Subquery(last_message_subquery),
-            last_message_content=Subquery(last_message_content_subquery),
         ).select_related(
             "user_1",
             "user_2",
-        ).order_by("-last_message_datetime").distinct()
+        )
+        if self.action == "list":
+            qs = qs.filter(last_message__isnull=False).order_by("-last_message_at")
         return qs
 
-    @action(detail=True, methods=["get"])
+    @action(detail=True, methods=["get"], pagination_class=MessageHistoryPagination)
     def messages(self, request, pk=None):
-        messages = self.get_object().messages.filter(chat__id=pk).annotate(
-            message_author=Case(
-                When(author=self.request.user, then=Value("Вы")),
-                default=F("author__first_name"),
-                output_field=CharField(),
-            )
-        ).order_by("-created_at")
-        serializer = self.get_serializer(messages, many=True)
-        return Response(serializer.data)
+        """
+        method shows chat history window by window, newest messages first
+
+        use `before` with the oldest shown id to load older messages and
+        `after` (`since`) with the newest shown id to load only new ones
+        """
+        chat = self.get_object()
+        messages = chat.messages.only("id", "content", "author", "chat", "created_at")
+        page = self.paginate_queryset(messages)
+        serializer = self.get_serializer(page, many=True, context={**self.get_serializer_context(), "chat": chat})
+        return self.get_paginated_response(serializer.data)
 
 
 class MessageViewSet(
@@ -0,0 +1,252 @@
+"""
+Benchmark of the API endpoints against the current database
+
+Requests go through the in-process APIClient with a real JWT, so routing,
+authentication, serialization and SQL are measured, the network is not.
+Writes run inside a rolled back transaction and leave the data unchanged.
+Use a seeded dataset (manage.py generate_dataset) to compare runs.
+"""
+import platform
+import statistics
+import time
+from itertools import count
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+from general import cache
+from general.api.urls import urlpatterns
+from general.metrics import QueryTimer
+from general.models import User, Post, Comment, Chat, Messages, Reaction
+
+# names of the routes every run should cover: general.api and the JWT views of config/urls.py
+API_ROUTES = {pattern.name for pattern in urlpatterns} | {'token_obtain_pair', 'token_refresh'}
+
+
+class Scenario:
+    """
+    One request repeated by the benchmark
+
+    ``path`` and string values of ``data`` are formatted with fixture names,
+    e.g. "/api/posts/{post}/"; fixtures starting with "new_" create a fresh
+    object for every request.
+    """
+
+    def __init__(self, method, path, data=None, write=False, label=''):
+        self.method = method
+        self.path = path
+        self.data = data
+        self.write = write
+        self.name = f'{method.upper()} {path}{label}'
+
+
+SCENARIOS = [
+    Scenario('post', '/api/token/', {'username': '{username}', 'password': '{password}'}),
+    Scenario('post', '/api/token/refresh/', {'refresh': '{refresh}'}),
+    Scenario('get', '/api/users/'),
+    Scenario('get', '/api/users/', {'pagination': 'cursor'}, label=' cursor'),
+    Scenario('post', '/api/users/', {'username': '{new_username}', 'password': 'Bench-password-1',
+                                     'email': 'bench@example.com', 'first_name': 'bench', 'last_name': 'bench'},
+             write=True),
+    Scenario('get', '/api/users/{stranger}/'),
+    Scenario('get', '/api/users/myself/'),
+    Scenario('get', '/api/users/{user}/friends/'),
+    Scenario('get', '/api/users/{friend}/posts/'),
+    Scenario('get', '/api/users/suggestions/'),
+    Scenario('get', '/api/users/{stranger}/path/'),
+    Scenario('post', '/api/users/{stranger}/add/', write=True),
+    Scenario('post', '/api/users/{friend}/delete/', write=True),
+    Scenario('get', '/api/posts/'),
+    Scenario('post', '/api/posts/', {'title': 'bench', 'body': 'bench post'}, write=True),
+    Scenario('get', '/api/posts/{post}/'),
+    Scenario('get', '/api/posts/{post}/', {'reactions': 'summary'}, label=' summary'),
+    Scenario('patch', '/api/posts/{new_post}/', {'body': 'edited'}, write=True),
+    Scenario('delete', '/api/posts/{new_post}/', write=True),
+    Scenario('get', '/api/feed/'),
+    Scenario('get', '/api/search/', {'q': '{word}'}),
+    Scenario('get', '/api/comments/', {'post__id': '{post}'}),
+    Scenario('post', '/api/comments/', {'post': '{post}', 'body': 'bench comment'}, write=True),
+    Scenario('delete', '/api/comments/{new_comment}/', write=True),
+    Scenario('post', '/api/comments/bulk/', [{'post': '{post}', 'body': 'bench comment'}] * 20, write=True),
+    Scenario('post', '/api/reactions/', {'post': '{post}', 'value': Reaction.Values.HEART}, write=True),
+    Scenario('post', '/api/reactions/bulk/', [{'post': '{post}', 'value': Reaction.Values.SMILE}] * 20,
+             write=True),
+    Scenario('get', '/api/chats/'),
+    Scenario('post', '/api/chats/', {'user_2': '{stranger}'}, write=True),
+    Scenario('delete', '/api/chats/{new_chat}/', write=True),
+    Scenario('get', '/api/chats/{chat}/messages/'),
+    Scenario('post', '/api/messages/', {'chat': '{chat}', 'content': 'bench message'}, write=True),
+    Scenario('delete', '/api/messages/{new_message}/', write=True),
+]
+
+
+class Fixtures(dict):
+    """
+    Ids of the objects scenarios refer to, "new_" fixtures are created on access
+    """
+
+    def __init__(self, user, password, refresh, **ids):
+        super().__init__(user=user.pk, username=user.username, password=password, refresh=refresh, **ids)
+        self.user = user
+        self.sequence = count()
+
+    def __missing__(self, key):
+        return getattr(self, key)()
+
+    def new_username(self):
+        return f'bench_{time.time_ns()}_{next(self.sequence)}'
+
+    def new_post(self):
+        return Post.objects.create(author=self.user, title='bench', body='bench post').pk
+
+    def new_comment(self):
+        return Comment.objects.create(author=self.user, post_id=self['post'], body='bench comment').pk
+
+    def new_chat(self):
+        return Chat.objects.create(user_1=self.user, user_2_id=self['stranger']).pk
+
+    def new_message(self):
+        return Messages.objects.create(author=self.user, chat_id=self['chat'], content='bench message').pk
+
+    def format(self, value):
+        if isinstance(value, str):
+            return value.format_map(self)
+        if isinstance(value, dict):
+            return {key: self.format(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.format(item) for item in value]
+        return value
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1] * 1000, 3)
+
+
+class Benchmark:
+    """
+    :param username: user the requests are made by, the user with most friends by default
+    :param password: password of that user, generate_dataset gives "password" to everyone
+    :param cold_cache: clear the response cache before every request
+    """
+
+    def __init__(self, username=None, password='password', iterations=20, warmup=2, cold_cache=False):
+        self.password = password
+        self.iterations = iterations
+        self.warmup = warmup
+        self.cold_cache = cold_cache
+        # not an INTERNAL_IPS address, so the debug toolbar stays off
+        self.client = APIClient(REMOTE_ADDR='203.0.113.10')
+        users = User.objects.all()
+        if username:
+            users = users.filter(username=username)
+        self.user = users.annotate(friend_count=Count('friends')).order_by('-friend_count', 'id').first()
+        if self.user is None:
+            raise ValueError('No user to run the benchmark as, seed the database first')
+
+    def prepare(self):
+        response = self.client.post('/api/token/', {'username': self.user.username, 'password': self.password},
+                                    format='json')
+        if response.status_code != 200:
+            raise ValueError(f'Can not log in as {self.user.username}: {response.data}')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        friends = self.user.friends.all()
+        friend = friends.order_by('id').first()
+        stranger = (User.objects.exclude(pk=self.user.pk).exclude(pk__in=friends.values('pk'))
+                    .exclude(Q(chats_as_user1__user_2=self.user) | Q(chats_as_user2__user_1=self.user))
+                    .order_by('id').first())
+        post = Post.objects.filter(author=friend).order_by('-id').first() or Post.objects.order_by('-id').first()
+        chat = Chat.objects.filter(Q(user_1=self.user) | Q(user_2=self.user)).order_by('-last_message_at').first()
+        missing = [name for name, obj in (('friend', friend), ('stranger', stranger), ('post', post), ('chat', chat))
+                   if obj is None]
+        if missing:
+            raise ValueError(f'{self.user.username} has no {", ".join(missing)}, use a larger dataset')
+        return Fixtures(self.user, self.password, response.data['refresh'],
+                        friend=friend.pk, stranger=stranger.pk, post=post.pk, chat=chat.pk,
+                        word=post.title.split()[0] if post.title.split() else 'a')
+
+    def request(self, scenario, fixtures):
+        path = fixtures.format(scenario.path)
+        data = fixtures.format(scenario.data)
+        if self.cold_cache:
+            cache.get_cache().clear()
+        queries = QueryTimer()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            response = getattr(self.client, scenario.method)(path, data, format='json')
+            elapsed = time.perf_counter() - started
+        return path, response, elapsed, queries.count, queries.time
+
+    def measure(self, scenario, fixtures):
+        samples = []
+        for iteration in range(self.warmup + self.iterations):
+            if scenario.write:
+                with transaction.atomic():
+                    sample = self.request(scenario, fixtures)
+                    transaction.set_rollback(True)
+            else:
+                sample = self.request(scenario, fixtures)
+            if iteration >= self.warmup:
+                samples.append(sample)
+        path, response = samples[-1][0], samples[-1][1]
+        latencies = [sample[2] for sample in samples]
+        quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+        return path, {
+            'status': response.status_code,
+            'iterations': len(samples),
+            'p50_ms': percentile(quantiles, 50),
+            'p95_ms': percentile(quantiles, 95),
+            'p99_ms': percentile(quantiles, 99),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+            'queries': max(sample[3] for sample in samples),
+            'sql_ms': round(statistics.fmean(sample[4] for sample in samples) * 1000, 3),
+        }
+
+    def run(self, scenarios=SCENARIOS):
+        """
+        :return: report dict, see compare() for the baseline check
+        """
+        fixtures = self.prepare()
+        endpoints = {}
+        covered = set()
+        for scenario in scenarios:
+            path, result = self.measure(scenario, fixtures)
+            covered.add(resolve(path).url_name)
+            endpoints[scenario.name] = result
+        return {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'user': self.user.username,
+            'iterations': self.iterations,
+            'cold_cache': self.cold_cache,
+            'uncovered_routes': sorted(API_ROUTES - covered),
+            'endpoints': endpoints,
+        }
+
+
+def compare(report, baseline, latency_tolerance=0.5, min_latency_ms=2.0):
+    """
+    Regressions of ``report`` against ``baseline``
+
+    Any extra query is a regression, that is where new N+1 queries show up.
+    Latency is compared by the median, the tail is too noisy on a shared
+    machine: it is a regression when it grew by more than ``latency_tolerance``
+    and by more than ``min_latency_ms``.
+
+    :return: list of messages, empty when there are no regressions
+    """
+    regressions = []
+    for name, result in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        if result['status'] != before['status']:
+            regressions.append(f'{name}: status {before["status"]} -> {result["status"]}')
+        if result['queries'] > before['queries']:
+            regressions.append(f'{name}: {before["queries"]} -> {result["queries"]} queries')
+        growth = result['p50_ms'] - before['p50_ms']
+        if growth > min_latency_ms and growth > before['p50_ms'] * latency_tolerance:
+            regressions.append(f'{name}: p50 {before["p50_ms"]}ms -> {result["p50_ms"]}ms')
+    return regressions
@@ -0,0 +1,99 @@
+"""
+Versioned read-through cache for serialized API responses
+
+Every cached object has a version key; a body is stored under the version
+that was current when it was built. Invalidation only replaces the version,
+so stale bodies become unreachable and are evicted by the cache backend
+(LRU by MAX_ENTRIES and TTL by TIMEOUT of settings.CACHES[RESPONSE_CACHE_ALIAS]).
+"""
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from general.replica import primary_reads
+
+
+class CacheStats:
+    """
+    In-process hit and miss counters per namespace
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    def record(self, namespace, hit):
+        with self._lock:
+            self._counters[namespace]['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {namespace: dict(counters) for namespace, counters in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def version_key(namespace, pk):
+    return f'version:{namespace}:{pk}'
+
+
+def get_version(namespace, pk):
+    cache = get_cache()
+    key = version_key(namespace, pk)
+    version = cache.get(key)
+    if version is None:
+        # a fresh version never matches bodies cached before the key was evicted
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace, pk):
+    get_cache().set(version_key(namespace, pk), time.time_ns(), timeout=None)
+
+
+def invalidate(namespace, *pks):
+    """
+    Makes cached bodies of objects ``pks`` unreachable
+
+    Versions are replaced right away and once more on commit, so a body built
+    from data read before the commit is not served under the new version.
+    """
+    def bump():
+        for pk in pks:
+            bump_version(namespace, pk)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_or_build(namespace, pk, build, variant=''):
+    """
+    Cached body of object ``pk``, built by ``build()`` on a miss
+
+    :param namespace: kind of cached object, e.g. "post"
+    :param pk: primary key of the object, the unit of invalidation
+    :param build: callable returning a picklable body
+    :param variant: distinguishes several bodies of the same object
+    """
+    cache = get_cache()
+    key = f'body:{namespace}{variant}:{pk}:{get_version(namespace, pk)}'
+    body = cache.get(key)
+    stats.record(namespace, hit=body is not None)
+    if body is None:
+        # a body built from the lagging replica would stay cached under the new version
+        with primary_reads():
+            body = build()
+        cache.set(key, body)
+    return body
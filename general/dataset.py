@@ -0,0 +1,150 @@
+"""
+Reproducible synthetic data for load tests and benchmarks
+
+Objects are built (not saved) by the factories of general/factories.py and
+written with bulk_create. The factories' Faker and every random choice made
+here are seeded, so the same options produce the same dataset.
+"""
+import random
+from collections import Counter
+import factory.random
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from general.factories import UserFactory, PostFactory, CommentFactory, ReactionFactory, ChatFactory, \
+    MessageFactory
+from general.models import User, Post, Comment, Reaction, Chat, Messages
+
+Friendship = User.friends.through
+
+
+def preferential_attachment(size, links, rng):
+    """
+    Edges of a Barabási-Albert graph over nodes 0..size-1
+
+    Every node is linked to ``links`` earlier nodes picked proportionally to
+    their degree, which gives the power-law degree distribution of social graphs.
+
+    :return: list of (node, earlier node)
+    """
+    edges = []
+    # a node appears here once per edge it has, so choice() is degree-weighted
+    ends = []
+    for node in range(1, size):
+        targets = set()
+        while len(targets) < min(links, node):
+            targets.add(rng.choice(ends) if ends else 0)
+        for target in sorted(targets):
+            edges.append((node, target))
+            ends.extend((node, target))
+    return edges
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DatasetGenerator:
+    """
+    :param users: number of users
+    :param friends: friendships made by every new user (the average degree is twice that)
+    :param posts: average number of posts per user
+    :param comments: average number of comments per post
+    :param reactions: average number of reactions per post
+    :param chats: average number of chats per user, each with a friend
+    :param messages: average number of messages per chat
+    :param password: password of every user, hashed once
+    """
+
+    def __init__(self, users, friends=5, posts=5, comments=2, reactions=3, chats=1, messages=10,
+                 seed=0, password='password', batch_size=1000):
+        self.users = users
+        self.friends = friends
+        self.posts = posts
+        self.comments = comments
+        self.reactions = reactions
+        self.chats = chats
+        self.messages = messages
+        self.seed = seed
+        self.password = password
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.created = Counter()
+
+    def count(self, average):
+        # uniform around the average keeps totals predictable for load tests
+        return self.rng.randint(0, 2 * average)
+
+    def create(self, model, objects):
+        with transaction.atomic():
+            created = model._base_manager.bulk_create(objects, batch_size=self.batch_size)
+        self.created[model] += len(objects)
+        return created
+
+    def generate(self):
+        """
+        :return: Counter of created rows per model
+        """
+        factory.random.reseed_random(self.seed)
+        user_ids = self.generate_users()
+        edges = [(user_ids[a], user_ids[b]) for a, b in preferential_attachment(len(user_ids), self.friends, self.rng)]
+        self.generate_friendships(edges)
+        post_ids = self.generate_posts(user_ids)
+        self.generate_comments_and_reactions(user_ids, post_ids)
+        self.generate_chats(edges)
+        return self.created
+
+    def generate_users(self):
+        password = make_password(self.password)
+        user_ids = []
+        for start in range(0, self.users, self.batch_size):
+            users = UserFactory.build_batch(min(self.batch_size, self.users - start), password=password,
+                                            is_staff=False)
+            for index, user in enumerate(users, start):
+                # Faker repeats user names, the seed and index make them unique
+                user.username = f'{user.username}_{self.seed}_{index}'
+            user_ids.extend(user.pk for user in self.create(User, users))
+        return user_ids
+
+    def generate_friendships(self, edges):
+        for batch in batched(edges, self.batch_size):
+            rows = []
+            for user_id, friend_id in batch:
+                rows.append(Friendship(from_user_id=user_id, to_user_id=friend_id))
+                rows.append(Friendship(from_user_id=friend_id, to_user_id=user_id))
+            self.create(Friendship, rows)
+
+    def generate_posts(self, user_ids):
+        post_ids = []
+        for batch in batched(user_ids, self.batch_size):
+            posts = [PostFactory.build(author=User(pk=user_id))
+                     for user_id in batch for _ in range(self.count(self.posts))]
+            post_ids.extend(post.pk for post in self.create(Post, posts))
+        return post_ids
+
+    def generate_comments_and_reactions(self, user_ids, post_ids):
+        values = Reaction.Values.values
+        for batch in batched(post_ids, self.batch_size):
+            comments, reactions = [], []
+            for post_id in batch:
+                post = Post(pk=post_id)
+                for _ in range(self.count(self.comments)):
+                    comments.append(CommentFactory.build(author=User(pk=self.rng.choice(user_ids)), post=post))
+                # one reaction per user and post
+                authors = self.rng.sample(user_ids, min(self.count(self.reactions), len(user_ids)))
+                reactions.extend(ReactionFactory.build(author=User(pk=author_id), post=post,
+                                                       value=self.rng.choice(values))
+                                 for author_id in authors)
+            self.create(Comment, comments)
+            self.create(Reaction, reactions)
+
+    def generate_chats(self, edges):
+        # friendships are distinct pairs, so chats between them are unique
+        pairs = self.rng.sample(edges, min(len(edges), self.users * self.chats // 2))
+        for batch in batched(pairs, self.batch_size):
+            chats = self.create(Chat, [ChatFactory.build(user_1=User(pk=user_1), user_2=User(pk=user_2))
+                                       for user_1, user_2 in batch])
+            messages = [MessageFactory.build(chat=chat, author=User(pk=self.rng.choice((chat.user_1_id,
+                                                                                         chat.user_2_id))))
+                        for chat in chats for _ in range(self.count(self.messages))]
+            self.create(Messages, messages)
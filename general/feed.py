@@ -0,0 +1,106 @@
+from django.conf import settings
+from general.models import User, Post, TimelineEntry
+
+Friendship = User.friends.through
+
+
+def friend_ids(user_id):
+    return Friendship.objects.filter(from_user_id=user_id).values('to_user_id')
+
+
+def fan_out_post(post):
+    """
+    Copies a new post into the timelines of its author's friends (fan-out-on-write)
+
+    Authors above FEED_FANOUT_THRESHOLD friends are skipped and their posts
+    are marked for fan-out-on-read instead.
+    """
+    friends = list(Friendship.objects.filter(from_user_id=post.author_id)
+                   .values_list('to_user_id', flat=True)[:settings.FEED_FANOUT_THRESHOLD + 1])
+    if len(friends) > settings.FEED_FANOUT_THRESHOLD:
+        Post.objects.filter(pk=post.pk).update(fanned_out=False)
+        post.fanned_out = False
+        return
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=friend_id, post_id=post.pk) for friend_id in friends],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(owner_id, author_ids, size=None):
+    """
+    Copies the latest fanned out posts of new friends into the owner's timeline
+    """
+    size = settings.FEED_BACKFILL_SIZE if size is None else size
+    entries = []
+    for author_id in author_ids:
+        post_ids = (Post.objects.filter(author_id=author_id, fanned_out=True)
+                    .order_by('-id').values_list('id', flat=True)[:size])
+        entries.extend(TimelineEntry(owner_id=owner_id, post_id=post_id) for post_id in post_ids)
+    TimelineEntry.objects.bulk_create(entries,
+                                      batch_size=settings.FEED_BATCH_SIZE,
+                                      ignore_conflicts=True)
+
+
+def drop_from_timeline(owner_id, author_ids):
+    TimelineEntry.objects.filter(owner_id=owner_id, post__author_id__in=author_ids).delete()
+
+
+def rebuild_timelines(batch_size=None):
+    """
+    Recreates every timeline from the friend graph, used for data created before the feed
+    """
+    batch_size = batch_size or settings.FEED_BATCH_SIZE
+    TimelineEntry.objects.all().delete()
+    created = 0
+    last_id = 0
+    while True:
+        posts = list(Post.objects.filter(id__gt=last_id)
+                     .order_by('id').values_list('id', 'author_id')[:batch_size])
+        if not posts:
+            break
+        friends = {}
+        for friendship in Friendship.objects.filter(
+                from_user_id__in={author_id for _, author_id in posts}).values_list('from_user_id', 'to_user_id'):
+            friends.setdefault(friendship[0], []).append(friendship[1])
+        entries = []
+        pulled = []
+        for post_id, author_id in posts:
+            author_friends = friends.get(author_id, [])
+            if len(author_friends) > settings.FEED_FANOUT_THRESHOLD:
+                pulled.append(post_id)
+                continue
+            entries.extend(TimelineEntry(owner_id=friend_id, post_id=post_id) for friend_id in author_friends)
+        TimelineEntry.objects.bulk_create(entries, batch_size=batch_size, ignore_conflicts=True)
+        Post.objects.filter(id__in=pulled).update(fanned_out=False)
+        Post.objects.filter(id__in=[post_id for post_id, _ in posts]).exclude(id__in=pulled).update(fanned_out=True)
+        created += len(entries)
+        last_id = posts[-1][0]
+    return created
+
+
+class Feed:
+    """
+    Home feed of ``user``: posts of friends, newest first
+
+    Reading a window is a range scan over the user's timeline merged with
+    the latest posts of friends whose posts are fanned out on read.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def window(self, before=None, limit=10):
+        timeline = TimelineEntry.objects.filter(owner=self.user)
+        pulled = Post.objects.filter(fanned_out=False, author_id__in=friend_ids(self.user.pk))
+        if before is not None:
+            timeline = timeline.filter(post_id__lt=before)
+            pulled = pulled.filter(id__lt=before)
+
+        post_ids = set(timeline.order_by('-post_id').values_list('post_id', flat=True)[:limit])
+        post_ids.update(pulled.order_by('-id').values_list('id', flat=True)[:limit])
+        post_ids = sorted(post_ids, reverse=True)[:limit]
+        if not post_ids:
+            return []
+        return list(Post.objects.filter(id__in=post_ids).select_related('author').order_by('-id'))
@@ -0,0 +1,232 @@
+"""
+In-memory copy of the User.friends graph
+
+Friends of every user are kept as a sorted array of ids, built with one scan
+of the through table. The process keeps its copy up to date with committed
+friendship changes and rebuilds it after FRIEND_GRAPH_TTL seconds, so changes
+made by other worker processes show up within that time.
+"""
+import heapq
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from django.conf import settings
+from general.models import User
+
+Friendship = User.friends.through
+
+SNAPSHOT_HEADER = struct.Struct('<qd')
+EMPTY = array('q')
+
+
+class FriendGraph:
+
+    def __init__(self, adjacency=None, built_at=None):
+        self.adjacency = adjacency if adjacency is not None else {}
+        self.built_at = time.time() if built_at is None else built_at
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_db(cls):
+        built_at = time.time()
+        rows = (Friendship.objects.order_by('from_user_id', 'to_user_id')
+                .values_list('from_user_id', 'to_user_id')
+                .iterator(chunk_size=10000))
+        adjacency = {
+            user_id: array('q', (friend_id for _, friend_id in group))
+            for user_id, group in groupby(rows, key=itemgetter(0))
+        }
+        return cls(adjacency, built_at)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a snapshot written by save()
+        """
+        with open(path, 'rb') as file:
+            size, built_at = SNAPSHOT_HEADER.unpack(file.read(SNAPSHOT_HEADER.size))
+            ids, lengths = array('q'), array('q')
+            ids.fromfile(file, size)
+            lengths.fromfile(file, size)
+            adjacency = {}
+            for user_id, length in zip(ids, lengths):
+                friends = array('q')
+                friends.fromfile(file, length)
+                adjacency[user_id] = friends
+        return cls(adjacency, built_at)
+
+    def save(self, path):
+        """
+        Writes the graph as flat native int64 arrays, replacing ``path`` atomically
+        """
+        with self._lock:
+            ids = array('q', sorted(self.adjacency))
+            lengths = array('q', (len(self.adjacency[user_id]) for user_id in ids))
+            # a temporary file of its own, several workers may save at the same time
+            directory, name = os.path.split(os.path.abspath(path))
+            with tempfile.NamedTemporaryFile('wb', dir=directory, prefix=f'{name}.', suffix='.tmp',
+                                             delete=False) as file:
+                try:
+                    file.write(SNAPSHOT_HEADER.pack(len(ids), self.built_at))
+                    ids.tofile(file)
+                    lengths.tofile(file)
+                    for user_id in ids:
+                        self.adjacency[user_id].tofile(file)
+                except BaseException:
+                    file.close()
+                    os.remove(file.name)
+                    raise
+            os.replace(file.name, path)
+
+    def is_stale(self):
+        return time.time() - self.built_at > settings.FRIEND_GRAPH_TTL
+
+    def friends(self, user_id):
+        return self.adjacency.get(user_id, EMPTY)
+
+    def add(self, user_id, friend_ids):
+        with self._lock:
+            for friend_id in friend_ids:
+                self._link(user_id, friend_id)
+                self._link(friend_id, user_id)
+
+    def remove(self, user_id, friend_ids):
+        with self._lock:
+            for friend_id in friend_ids:
+                self._unlink(user_id, friend_id)
+                self._unlink(friend_id, user_id)
+
+    def _link(self, user_id, friend_id):
+        friends = self.adjacency.setdefault(user_id, array('q'))
+        position = bisect_left(friends, friend_id)
+        if position == len(friends) or friends[position] != friend_id:
+            insort(friends, friend_id)
+
+    def _unlink(self, user_id, friend_id):
+        friends = self.adjacency.get(user_id, EMPTY)
+        position = bisect_left(friends, friend_id)
+        if position < len(friends) and friends[position] == friend_id:
+            del friends[position]
+
+    def suggestions(self, user_id, limit=10):
+        """
+        Non-friends ranked by number of mutual friends
+
+        :return: list of (user id, mutual friend count), best first
+        """
+        friends = self.friends(user_id)
+        mutual = Counter()
+        for friend_id in friends:
+            mutual.update(self.friends(friend_id))
+        mutual.pop(user_id, None)
+        for friend_id in friends:
+            mutual.pop(friend_id, None)
+        return heapq.nlargest(limit, mutual.items(), key=lambda item: (item[1], -item[0]))
+
+    def shortest_path(self, source, target, max_depth):
+        """
+        Shortest friend chain from ``source`` to ``target`` by bidirectional BFS
+
+        The smaller frontier is expanded first, so both searches stay about
+        max_depth / 2 levels deep.
+
+        :return: list of user ids from source to target, None if they are
+                 further than ``max_depth`` friendships apart
+        """
+        if source == target:
+            return [source]
+        forward_parents, backward_parents = {source: None}, {target: None}
+        forward, backward = [source], [target]
+        depth = 0
+        while forward and backward and depth < max_depth:
+            depth += 1
+            if len(forward) <= len(backward):
+                forward, meeting = self._expand(forward, forward_parents, backward_parents)
+            else:
+                backward, meeting = self._expand(backward, backward_parents, forward_parents)
+            if meeting is not None:
+                return self._join(meeting, forward_parents, backward_parents)
+        return None
+
+    def _expand(self, frontier, parents, other_parents):
+        next_frontier = []
+        for user_id in frontier:
+            for friend_id in self.friends(user_id):
+                if friend_id in parents:
+                    continue
+                parents[friend_id] = user_id
+                if friend_id in other_parents:
+                    return next_frontier, friend_id
+                next_frontier.append(friend_id)
+        return next_frontier, None
+
+    @staticmethod
+    def _join(meeting, forward_parents, backward_parents):
+        path = []
+        user_id = meeting
+        while user_id is not None:
+            path.append(user_id)
+            user_id = forward_parents[user_id]
+        path.reverse()
+        user_id = backward_parents[meeting]
+        while user_id is not None:
+            path.append(user_id)
+            user_id = backward_parents[user_id]
+        return path
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def build_graph():
+    """
+    Fresh graph: a recent snapshot when there is one, the database otherwise
+    """
+    path = settings.FRIEND_GRAPH_SNAPSHOT
+    if path and os.path.exists(path) and time.time() - os.path.getmtime(path) < settings.FRIEND_GRAPH_TTL:
+        try:
+            graph = FriendGraph.load(path)
+        except (OSError, EOFError, struct.error):
+            # removed or truncated meanwhile, rebuilt and written again below
+            graph = None
+        if graph is not None and not graph.is_stale():
+            return graph
+    graph = FriendGraph.from_db()
+    if path:
+        graph.save(path)
+    return graph
+
+
+def get_graph():
+    global _graph
+    with _graph_lock:
+        if _graph is None or _graph.is_stale():
+            _graph = build_graph()
+        return _graph
+
+
+def reset_graph():
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+def apply_friendship_change(user_id, friend_ids, added):
+    """
+    Updates the loaded graph, a graph built later reads the change from the database
+    """
+    graph = _graph
+    if graph is None:
+        return
+    if added:
+        graph.add(user_id, friend_ids)
+    else:
+        graph.remove(user_id, friend_ids)
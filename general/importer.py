@@ -0,0 +1,188 @@
+"""
+Bulk import of JSON fixture dumps (the format of dumpdata and fixtures/)
+
+Files are parsed one element at a time and rows are written with bulk_create,
+so memory grows only with the many-to-many links, which are inserted after
+all the objects of a file, and no model signals are sent: derived
+data (post counters, last messages of chats, timelines) is rebuilt afterwards
+by rebuild_derived_data().
+"""
+import json
+from collections import Counter
+from itertools import islice
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+WHITESPACE = ' \t\n\r'
+# commands recomputing what signals maintain for rows saved one by one
+DERIVED_DATA_COMMANDS = ('reconcile_post_counters', 'backfill_chat_last_message', 'rebuild_timelines')
+
+
+def iter_json_array(file, read_size=1 << 16):
+    """
+    Yields the elements of the JSON array in ``file`` one at a time
+
+    Only the element being parsed and one read buffer are held in memory.
+
+    :param file: text file object
+    :param read_size: number of characters read at once
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        data = file.read(read_size)
+        eof = not data
+        buffer = buffer[position:] + data
+        position = 0
+
+    def next_char():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                raise ValueError('Unexpected end of JSON array')
+            read_more()
+
+    if next_char() != '[':
+        raise ValueError('Expected a JSON array')
+    position += 1
+    if next_char() == ']':
+        return
+    while True:
+        next_char()
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            read_more()
+            continue
+        # a number at the end of the buffer may continue in the next read
+        if end == len(buffer) and not eof:
+            read_more()
+            continue
+        position = end
+        yield element
+        char = next_char()
+        position += 1
+        if char == ']':
+            return
+        if char != ',':
+            raise ValueError(f'Expected "," or "]" in JSON array, got {char!r}')
+
+
+def defer_constraint_checks(connection):
+    """
+    Postpones foreign key checks of the current transaction to its commit
+
+    Rows of one transaction may then refer to each other in any order.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA defer_foreign_keys = ON')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def m2m_rows(deserialized):
+    """
+    Through table rows of a deserialized object, both directions of symmetrical relations
+
+    :return: iterator of (through model, ((column, value), (column, value)))
+    """
+    instance = deserialized.object
+    for name, values in (deserialized.m2m_data or {}).items():
+        field = instance._meta.get_field(name)
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        symmetrical = field.remote_field.symmetrical and field.remote_field.model == type(instance)
+        for value in values:
+            yield through, ((source, instance.pk), (target, value))
+            if symmetrical:
+                yield through, ((source, value), (target, instance.pk))
+
+
+def insert_batch(batch, using, links):
+    """
+    :param batch: list of DeserializedObject
+    :param links: dict of through model to set of its rows, filled with the links of ``batch``
+    :return: Counter of inserted rows per model
+    """
+    by_model = {}
+    for deserialized in batch:
+        by_model.setdefault(type(deserialized.object), []).append(deserialized)
+        for through, columns in m2m_rows(deserialized):
+            links.setdefault(through, set()).add(columns)
+    inserted = Counter()
+    for model, objects in by_model.items():
+        model._base_manager.using(using).bulk_create([deserialized.object for deserialized in objects])
+        inserted[model] += len(objects)
+    return inserted
+
+
+def insert_links(links, using, batch_size, chunk_size):
+    """
+    Inserts through table rows, ``chunk_size`` rows per transaction
+
+    :return: Counter of inserted rows per through model
+    """
+    inserted = Counter()
+    for through, rows in links.items():
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            with transaction.atomic(using=using):
+                # a symmetrical link is listed by both of its ends
+                through._base_manager.using(using).bulk_create([through(**dict(columns)) for columns in chunk],
+                                                              batch_size=batch_size, ignore_conflicts=True)
+            inserted[through] += len(chunk)
+    return inserted
+
+
+def import_objects(objects, using, batch_size=1000, chunk_size=20000):
+    """
+    Inserts deserialized objects with bulk_create, ``chunk_size`` objects per transaction
+
+    Many-to-many links are inserted once all objects are, as they may refer
+    to objects of later chunks.
+
+    :param objects: iterable of DeserializedObject, e.g. from serializers.python.Deserializer
+    :param batch_size: number of objects per INSERT
+    :return: Counter of inserted rows per model, many-to-many rows included
+    """
+    connection = connections[using]
+    inserted = Counter()
+    links = {}
+    objects = iter(objects)
+    while chunk := list(islice(objects, chunk_size)):
+        with transaction.atomic(using=using):
+            defer_constraint_checks(connection)
+            for start in range(0, len(chunk), batch_size):
+                inserted += insert_batch(chunk[start:start + batch_size], using, links)
+    return inserted + insert_links(links, using, batch_size, chunk_size)
+
+
+def reset_sequences(models, using):
+    """
+    Moves primary key sequences past the imported ids (no-op on SQLite)
+    """
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), list(models))
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild_derived_data(batch_size, stdout=None):
+    """
+    Recounts post counters, chat last messages and timelines after bulk inserts
+    """
+    for command in DERIVED_DATA_COMMANDS:
+        call_command(command, batch_size=batch_size, stdout=stdout)
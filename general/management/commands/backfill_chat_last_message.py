@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from general.models import Chat
+from general.services import refresh_chat_last_message
+
+
+class Command(BaseCommand):
+    help = 'Fills last message columns of existing chats from their messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='number of chats updated per transaction')
+
+    def handle(self, *args, batch_size, **options):
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(Chat.objects.filter(id__gt=last_id)
+                       .order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += refresh_chat_last_message(Chat.objects.filter(id__in=ids))
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'{updated} chats updated'))
@@ -0,0 +1,54 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from general.benchmark import Benchmark, compare
+
+
+class Command(BaseCommand):
+    help = ('Measures latency percentiles, query count and SQL time of every API endpoint '
+            'and compares them with a baseline report')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark.json', help='file the JSON report is written to')
+        parser.add_argument('--baseline', default=None, help='earlier report to compare with')
+        parser.add_argument('--username', default=None,
+                            help='user the requests are made by, the user with most friends by default')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--iterations', type=int, default=20, help='measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests per endpoint')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='clear the response cache before every request')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='allowed relative growth of median latency')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        try:
+            benchmark = Benchmark(options['username'], options['password'], options['iterations'],
+                                  options['warmup'], options['cold_cache'])
+            report = benchmark.run()
+        except ValueError as error:
+            raise CommandError(error)
+
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+        self.stdout.write(f'{"endpoint":<50} {"status":>6} {"p50":>9} {"p95":>9} {"p99":>9} {"queries":>7} {"sql":>9}')
+        for name, result in report['endpoints'].items():
+            self.stdout.write(f'{name:<50} {result["status"]:>6} {result["p50_ms"]:>7.2f}ms {result["p95_ms"]:>7.2f}ms '
+                              f'{result["p99_ms"]:>7.2f}ms {result["queries"]:>7} {result["sql_ms"]:>7.2f}ms')
+        if report['uncovered_routes']:
+            self.stdout.write(self.style.WARNING(f'not covered: {", ".join(report["uncovered_routes"])}'))
+        self.stdout.write(f'report written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(report, baseline, options['latency_tolerance'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'no regressions against {options["baseline"]}'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from general.write_benchmark import PROFILE_PRAGMAS, run
+
+
+class Command(BaseCommand):
+    help = ('Measures concurrent write throughput (messages and reactions) of the SQLite database '
+            'profiles on copies of the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8,
+                            help='number of processes writing at the same time')
+        parser.add_argument('--writes', type=int, default=200,
+                            help='number of writes per worker')
+        parser.add_argument('--profiles', nargs='+', choices=list(PROFILE_PRAGMAS), default=list(PROFILE_PRAGMAS))
+
+    def handle(self, *args, workers, writes, profiles, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('benchmark_writes compares SQLite profiles, the database is not SQLite')
+        try:
+            results = run(profiles, workers, writes)
+        except (ValueError, RuntimeError) as error:
+            raise CommandError(error)
+
+        self.stdout.write(f'{"profile":<12} {"writes":>7} {"locked":>7} {"seconds":>8} '
+                          f'{"writes/s":>9} {"p50 ms":>8} {"p99 ms":>8}')
+        for profile, result in results.items():
+            self.stdout.write(f'{profile:<12} {result["writes"]:>7} {result["locked"]:>7} {result["seconds"]:>8} '
+                              f'{result["writes_per_second"]:>9} {result["p50_ms"]:>8} {result["p99_ms"]:>8}')
+        if len(results) > 1:
+            baseline = results[profiles[0]]
+            for profile, result in list(results.items())[1:]:
+                ratio = result['writes_per_second'] / baseline['writes_per_second'] if baseline['writes_per_second'] else 0
+                self.stdout.write(self.style.SUCCESS(f'{profile}: {ratio:.1f}x the write throughput of {profiles[0]}'))
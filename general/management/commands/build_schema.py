@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from drf_spectacular.drainage import GENERATOR_STATS
+from general.schema import build_schema
+
+
+class Command(BaseCommand):
+    help = 'Writes the OpenAPI schema served on /api/schema/ to OPENAPI_SCHEMA_DIR, run it on every deploy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None,
+                            help='OPENAPI_SCHEMA_DIR by default')
+        parser.add_argument('--fail-on-warn', action='store_true',
+                            help='fail when generating the schema gives warnings')
+
+    def handle(self, *args, output_dir, fail_on_warn, **options):
+        paths = build_schema(output_dir or settings.OPENAPI_SCHEMA_DIR)
+        GENERATOR_STATS.emit_summary()
+        if fail_on_warn and GENERATOR_STATS:
+            raise CommandError('Schema generation gave warnings')
+        for path in paths:
+            self.stdout.write(self.style.SUCCESS(f'{path}: {path.stat().st_size} bytes'))
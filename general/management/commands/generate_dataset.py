@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from general.dataset import DatasetGenerator
+from general.importer import rebuild_derived_data
+
+
+class Command(BaseCommand):
+    help = 'Creates a reproducible synthetic dataset with a power-law friend graph for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--friends', type=int, default=5,
+                            help='friendships made by every new user, the average degree is twice that')
+        parser.add_argument('--posts', type=int, default=5, help='average posts per user')
+        parser.add_argument('--comments', type=int, default=2, help='average comments per post')
+        parser.add_argument('--reactions', type=int, default=3, help='average reactions per post')
+        parser.add_argument('--chats', type=int, default=1, help='average chats per user')
+        parser.add_argument('--messages', type=int, default=10, help='average messages per chat')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='password', help='password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='number of objects per INSERT and transaction')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='do not recount post counters, chat last messages and timelines')
+
+    def handle(self, *args, skip_derived, **options):
+        started = time.monotonic()
+        generator = DatasetGenerator(
+            options['users'], friends=options['friends'], posts=options['posts'], comments=options['comments'],
+            reactions=options['reactions'], chats=options['chats'], messages=options['messages'],
+            seed=options['seed'], password=options['password'], batch_size=options['batch_size'],
+        )
+        created = generator.generate()
+        elapsed = time.monotonic() - started
+        for model, rows in created.items():
+            self.stdout.write(f'{model._meta.label}: {rows} rows')
+        rows = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(f'{rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)'))
+
+        if not skip_derived:
+            rebuild_derived_data(options['batch_size'], stdout=self.stdout)
@@ -0,0 +1,49 @@
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer
+from django.db import DEFAULT_DB_ALIAS, IntegrityError
+from general.importer import iter_json_array, import_objects, reset_sequences, rebuild_derived_data
+
+
+class Command(BaseCommand):
+    help = ('Imports JSON fixture files with bulk inserts instead of loaddata; '
+            'files are imported in the given order, list referenced models first')
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture_files', nargs='+',
+                            help='e.g. fixtures/User.json fixtures/Post.json fixtures/Comment.json fixtures/reac.json')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='number of objects per INSERT')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='number of objects per transaction')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='do not recount post counters, chat last messages and timelines')
+
+    def handle(self, *args, fixture_files, batch_size, chunk_size, database, skip_derived, **options):
+        total = Counter()
+        started = time.monotonic()
+        for path in fixture_files:
+            file_started = time.monotonic()
+            try:
+                with open(path, encoding='utf-8') as file:
+                    objects = Deserializer(iter_json_array(file), using=database)
+                    inserted = import_objects(objects, database, batch_size, chunk_size)
+            except (OSError, ValueError, DeserializationError, IntegrityError) as error:
+                raise CommandError(f'{path}: {error}')
+            self.report(path, sum(inserted.values()), time.monotonic() - file_started)
+            total += inserted
+        reset_sequences(total, database)
+
+        for model, rows in total.items():
+            self.stdout.write(f'{model._meta.label}: {rows} rows')
+        self.report('total', sum(total.values()), time.monotonic() - started)
+
+        if not skip_derived:
+            rebuild_derived_data(batch_size, stdout=self.stdout)
+
+    def report(self, label, rows, elapsed):
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'{label}: {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s)'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from general.feed import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds home feed timelines of all users from posts and the friend graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='number of posts fanned out per query')
+
+    def handle(self, *args, batch_size, **options):
+        with transaction.atomic():
+            created = rebuild_timelines(batch_size)
+        self.stdout.write(self.style.SUCCESS(f'{created} timeline entries created'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from general.models import Post
+from general.services import reconcile_post_counters
+
+
+class Command(BaseCommand):
+    help = 'Recounts reaction and comment counters of posts and fixes the drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='number of posts checked per transaction')
+
+    def handle(self, *args, batch_size, **options):
+        fixed = {}
+        last_id = 0
+        while True:
+            ids = list(Post.objects.filter(id__gt=last_id)
+                       .order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                for field, count in reconcile_post_counters(Post.objects.filter(id__in=ids)).items():
+                    fixed[field] = fixed.get(field, 0) + count
+            last_id = ids[-1]
+        for field, count in fixed.items():
+            self.stdout.write(f'{field}: {count} posts fixed')
+        self.stdout.write(self.style.SUCCESS(f'{sum(fixed.values())} counters fixed'))
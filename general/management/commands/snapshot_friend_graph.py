@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from general.graph import FriendGraph
+
+
+class Command(BaseCommand):
+    help = 'Writes the friend graph read by suggestions to FRIEND_GRAPH_SNAPSHOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None,
+                            help='snapshot file, FRIEND_GRAPH_SNAPSHOT by default')
+
+    def handle(self, *args, path, **options):
+        path = path or settings.FRIEND_GRAPH_SNAPSHOT
+        if not path:
+            raise CommandError('FRIEND_GRAPH_SNAPSHOT is not set and --path is not given')
+        graph = FriendGraph.from_db()
+        graph.save(path)
+        self.stdout.write(self.style.SUCCESS(f'{len(graph.adjacency)} users written to {path}'))
@@ -0,0 +1,37 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from general.replica import REPLICA_DB_ALIAS, copy_database
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database to the replica (DATABASE_REPLICA_NAME)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=None,
+                            help='primary database file, NAME of the default database by default')
+        parser.add_argument('--target', default=None,
+                            help='replica database file, NAME of the replica database by default')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='keep copying every that many seconds instead of once')
+
+    def handle(self, *args, source, target, interval, **options):
+        source = source or self.database_file(DEFAULT_DB_ALIAS)
+        target = target or self.database_file(REPLICA_DB_ALIAS)
+        while True:
+            started = time.monotonic()
+            copy_database(source, target)
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(f'{source} copied to {target} in {elapsed:.2f}s'))
+            if interval is None:
+                return
+            time.sleep(max(interval - elapsed, 0))
+
+    def database_file(self, alias):
+        database = settings.DATABASES.get(alias)
+        if database is None:
+            raise CommandError(f'"{alias}" database is not configured, set DATABASE_REPLICA_NAME')
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError(f'"{alias}" database is not SQLite, replicate it with the tools of its server')
+        return database['NAME']
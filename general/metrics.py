@@ -0,0 +1,253 @@
+"""
+Request metrics per viewset action, served in the Prometheus text format
+
+MetricsMiddleware records latency, SQL query count, SQL time and response
+size of every request into in-process histograms labelled by view, action
+and method, e.g. view="ChatViewSet", action="messages". metrics_view serves
+them on /metrics together with the response cache hit counters.
+
+A worker process only sees its own requests. With several workers set
+METRICS_MULTIPROC_DIR to a directory shared by them: every process writes
+its snapshot there (at most every METRICS_FLUSH_INTERVAL seconds) and
+/metrics sums the snapshots of all processes.
+"""
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from general import cache
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Time spent handling the request',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    ),
+    'http_request_sql_queries': (
+        'Number of SQL queries made by the request',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+    ),
+    'http_request_sql_duration_seconds': (
+        'Time spent in SQL queries of the request',
+        (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    ),
+    'http_response_size_bytes': (
+        'Size of the response body',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+    ),
+}
+LABELS = ('view', 'action', 'method')
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper() counting queries and their time
+
+    The debug query log rounds durations to milliseconds, too coarse for SQLite.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """
+    Histograms of HISTOGRAMS keyed by label values
+
+    A series is {"buckets": counts per bucket and one for +Inf, "sum": ..., "count": ...},
+    bucket counts are not cumulative until exported.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.series = {name: {} for name in HISTOGRAMS}
+
+    def observe(self, labels, values):
+        """
+        :param labels: tuple of label values in LABELS order
+        :param values: dict of histogram name to the observed value
+        """
+        with self._lock:
+            for name, value in values.items():
+                bounds = HISTOGRAMS[name][1]
+                series = self.series[name].get(labels)
+                if series is None:
+                    series = self.series[name][labels] = {'buckets': [0] * (len(bounds) + 1), 'sum': 0, 'count': 0}
+                series['buckets'][bisect_left(bounds, value)] += 1
+                series['sum'] += value
+                series['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: [{'labels': list(labels), **series, 'buckets': list(series['buckets'])}
+                       for labels, series in series_by_labels.items()]
+                for name, series_by_labels in self.series.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.series = {name: {} for name in HISTOGRAMS}
+
+
+registry = MetricsRegistry()
+_last_flush = 0.0
+
+
+def resolve_labels(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved', '', request.method
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if view_class is None:
+        return match.view_name, '', request.method
+    # viewsets map methods to actions, e.g. {"get": "messages"}
+    actions = getattr(match.func, 'actions', None) or {}
+    return view_class.__name__, actions.get(request.method.lower(), request.method.lower()), request.method
+
+
+def process_snapshot():
+    return {'pid': os.getpid(), 'histograms': registry.snapshot(), 'cache': cache.stats.snapshot()}
+
+
+def flush(force=False):
+    """
+    Writes the snapshot of this process to METRICS_MULTIPROC_DIR
+    """
+    global _last_flush
+    directory = settings.METRICS_MULTIPROC_DIR
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL):
+        return
+    _last_flush = now
+    path = Path(directory) / f'{os.getpid()}.json'
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(process_snapshot()))
+    os.replace(tmp_path, path)
+
+
+def collect():
+    """
+    Snapshots of every process, this one first
+    """
+    snapshots = [process_snapshot()]
+    directory = settings.METRICS_MULTIPROC_DIR
+    if directory:
+        flush(force=True)
+        for path in Path(directory).glob('*.json'):
+            if path.stem == str(os.getpid()):
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                # being replaced by its process
+                continue
+    return snapshots
+
+
+def merge(snapshots):
+    histograms = {name: {} for name in HISTOGRAMS}
+    cache_counters = {}
+    for snapshot in snapshots:
+        for name, series_list in snapshot['histograms'].items():
+            for series in series_list:
+                labels = tuple(series['labels'])
+                total = histograms[name].get(labels)
+                if total is None:
+                    histograms[name][labels] = {'buckets': list(series['buckets']),
+                                                'sum': series['sum'], 'count': series['count']}
+                    continue
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], series['buckets'])]
+                total['sum'] += series['sum']
+                total['count'] += series['count']
+        for namespace, counters in snapshot['cache'].items():
+            total = cache_counters.setdefault(namespace, {'hits': 0, 'misses': 0})
+            for result, value in counters.items():
+                total[result] += value
+    return histograms, cache_counters
+
+
+def label_text(names, values, extra=''):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+    return '{' + ','.join(filter(None, (pairs, extra))) + '}'
+
+
+def render(snapshots):
+    """
+    Prometheus text exposition format 0.0.4 of merged ``snapshots``
+    """
+    histograms, cache_counters = merge(snapshots)
+    lines = []
+    for name, (documentation, bounds) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, series in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, bucket in zip((*bounds, '+Inf'), series['buckets']):
+                cumulative += bucket
+                le = f'le="{bound}"'
+                lines.append(f'{name}_bucket{label_text(LABELS, labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{label_text(LABELS, labels)} {series["sum"]}')
+            lines.append(f'{name}_count{label_text(LABELS, labels)} {series["count"]}')
+    lines.append('# HELP response_cache_requests_total Lookups of the response cache')
+    lines.append('# TYPE response_cache_requests_total counter')
+    for namespace, counters in sorted(cache_counters.items()):
+        for result, value in sorted(counters.items()):
+            labels = label_text(('namespace', 'result'), (namespace, result))
+            lines.append(f'response_cache_requests_total{labels} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL and response size of every request into ``registry``
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        values = {
+            'http_request_duration_seconds': elapsed,
+            'http_request_sql_queries': queries.count,
+            'http_request_sql_duration_seconds': queries.time,
+        }
+        if not response.streaming:
+            values['http_response_size_bytes'] = len(response.content)
+        registry.observe(resolve_labels(request), values)
+        flush()
+        return response
+
+
+def metrics_view(request):
+    """
+    Metrics of all worker processes, protected by METRICS_TOKEN when it is set
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if token and not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.4 on 2026-10-17 04:04
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+import django.db.models.deletion
+
+
+def fill_last_messages(apps, schema_editor):
+    # same as general.services.refresh_chat_last_message, on the historical models
+    Chat = apps.get_model('general', 'Chat')
+    Messages = apps.get_model('general', 'Messages')
+    latest = Messages.objects.filter(chat=OuterRef('pk')).order_by('-id')
+    preview = latest.annotate(preview=Substr('content', 1, 100)).values('preview')[:1]
+    Chat.objects.update(
+        last_message=Subquery(latest.values('id')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        last_message_preview=Coalesce(Subquery(preview), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='general.messages'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['user_1', '-last_message_at'], name='chat_user_1_last_message_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['user_2', '-last_message_at'], name='chat_user_2_last_message_idx'),
+        ),
+        migrations.RunPython(fill_last_messages, migrations.RunPython.noop),
+    ]
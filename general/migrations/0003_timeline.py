@@ -0,0 +1,69 @@
+# Generated by Django 4.2.4 on 2026-10-17 04:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    # same as general.feed.rebuild_timelines, on the historical models
+    Post = apps.get_model('general', 'Post')
+    TimelineEntry = apps.get_model('general', 'TimelineEntry')
+    Friendship = apps.get_model('general', 'User').friends.through
+    batch_size = settings.FEED_BATCH_SIZE
+    last_id = 0
+    while posts := list(Post.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'author_id')[:batch_size]):
+        friends = {}
+        for author_id, friend_id in Friendship.objects.filter(
+                from_user_id__in={author_id for _, author_id in posts}).values_list('from_user_id', 'to_user_id'):
+            friends.setdefault(author_id, []).append(friend_id)
+        entries, pulled = [], []
+        for post_id, author_id in posts:
+            author_friends = friends.get(author_id, [])
+            if len(author_friends) > settings.FEED_FANOUT_THRESHOLD:
+                pulled.append(post_id)
+            else:
+                entries.extend(TimelineEntry(owner_id=friend_id, post_id=post_id) for friend_id in author_friends)
+        TimelineEntry.objects.bulk_create(entries, batch_size=batch_size, ignore_conflicts=True)
+        Post.objects.filter(id__in=pulled).update(fanned_out=False)
+        last_id = posts[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0002_chat_last_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='fanned_out',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['author', '-id'], name='post_fan_out_on_read_idx'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='general.post'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(models.F('owner'), models.F('post'), name='owner_post_unique'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.4 on 2026-10-17 04:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('general', 'Post')
+    Comment = apps.get_model('general', 'Comment')
+    Reaction = apps.get_model('general', 'Reaction')
+
+    def count(queryset):
+        return Coalesce(Subquery(
+            queryset.filter(post=OuterRef('pk')).order_by().values('post')
+            .annotate(count=Count('*')).values('count')
+        ), 0)
+
+    counters = {'comments_count': count(Comment.objects.all())}
+    for value in ('smile', 'thumb_up', 'sad', 'heart', 'laugh'):
+        counters[f'{value}_count'] = count(Reaction.objects.filter(value=value))
+    Post.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0003_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='heart_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='laugh_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='sad_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='smile_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumb_up_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
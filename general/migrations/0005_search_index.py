@@ -0,0 +1,51 @@
+# Generated by Django 4.2.4 on 2026-10-17 04:31
+
+from django.db import migrations
+
+# external content FTS5 tables over posts and comments, kept in sync by triggers
+INDEXES = {
+    'general_post_fts': ('general_post', ('title', 'body')),
+    'general_comment_fts': ('general_comment', ('body',)),
+}
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for index, (table, columns) in INDEXES.items():
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        delete = (f"INSERT INTO {index}({index}, rowid, {names}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+        insert = f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new_values});"
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {index} USING fts5({names}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(f"CREATE TRIGGER {index}_ai AFTER INSERT ON {table} BEGIN {insert} END")
+        schema_editor.execute(f"CREATE TRIGGER {index}_ad AFTER DELETE ON {table} BEGIN {delete} END")
+        schema_editor.execute(
+            f"CREATE TRIGGER {index}_au AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END"
+        )
+        schema_editor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for index in INDEXES:
+        for trigger in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {index}_{trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {index}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0004_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.4 on 2026-10-17 04:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# foreign keys whose single-column index is replaced by a composite index starting with them
+REPLACED_INDEXES = (('comment', 'post'), ('messages', 'chat'), ('post', 'author'), ('reaction', 'post'))
+
+
+def drop_foreign_key_indexes(apps, schema_editor):
+    # AlterField(db_index=False) would rebuild the tables on SQLite and drop the search triggers
+    connection = schema_editor.connection
+    for model_name, field_name in REPLACED_INDEXES:
+        model = apps.get_model('general', model_name)
+        column = model._meta.get_field(field_name).column
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        for name, constraint in constraints.items():
+            if constraint['index'] and not constraint['unique'] and constraint['columns'] == [column] \
+                    and not constraint.get('foreign_key'):
+                schema_editor.execute(schema_editor._delete_index_sql(model, name))
+
+
+def create_foreign_key_indexes(apps, schema_editor):
+    for model_name, field_name in REPLACED_INDEXES:
+        model = apps.get_model('general', model_name)
+        schema_editor.execute(schema_editor._create_index_sql(model, fields=[model._meta.get_field(field_name)]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-id'], name='comment_post_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='messages',
+            index=models.Index(fields=['chat', '-id'], name='messages_chat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-id'], name='post_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['post', 'value'], name='reaction_post_value_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='comment',
+                    name='post',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='general.post'),
+                ),
+                migrations.AlterField(
+                    model_name='messages',
+                    name='chat',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='general.chat'),
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='reaction',
+                    name='post',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='general.post'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(drop_foreign_key_indexes, create_foreign_key_indexes),
+            ],
+        ),
+    ]
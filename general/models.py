@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import functions, F
 from django.contrib.auth.models import AbstractUser
 
@@ -10,17 +10,46 @@ class User(AbstractUser):
         blank=True
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered to invalidate cached bodies showing the username when it changes
+        if 'username' in field_names:
+            instance._loaded_username = instance.username
+        return instance
+
     def __str__(self):
         return self.username
 
 
 class Post(models.Model):
     title = models.CharField(max_length=64)
+    # indexed by post_author_idx
     author = models.ForeignKey(to=User,
                                related_name='posts',
-                               on_delete=models.CASCADE)
+                               on_delete=models.CASCADE,
+                               db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     body = models.TextField()
+    # False when the author had too many friends to copy the post into their timelines,
+    # such posts are pulled into the feed on read
+    fanned_out = models.BooleanField(default=True)
+    # counters maintained by general.signals, see REACTION_COUNTER_FIELDS
+    comments_count = models.PositiveIntegerField(default=0)
+    smile_count = models.PositiveIntegerField(default=0)
+    thumb_up_count = models.PositiveIntegerField(default=0)
+    sad_count = models.PositiveIntegerField(default=0)
+    heart_count = models.PositiveIntegerField(default=0)
+    laugh_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # posts of a user, newest first
+            models.Index(fields=['author', '-id'], name='post_author_idx'),
+            models.Index(fields=['author', '-id'],
+                         condition=models.Q(fanned_out=False),
+                         name='post_fan_out_on_read_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -31,11 +60,19 @@ class Comment(models.Model):
     author = models.ForeignKey(to=User,
                                on_delete=models.CASCADE,
                                related_name='comments')
+    # indexed by comment_post_idx
     post = models.ForeignKey(to=Post,
                              on_delete=models.CASCADE,
-                             related_name='comments')
+                             related_name='comments',
+                             db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # comments of a post, newest first
+            models.Index(fields=['post', '-id'], name='comment_post_idx'),
+        ]
+
     def __str__(self):
         return f'{self.author}-{self.post}'
 
@@ -50,10 +87,15 @@ class Reaction(models.Model):
 
     value = models.CharField(max_length=8, choices=Values.choices, null=True)
     author = models.ForeignKey(to=User, related_name='reactions', on_delete=models.CASCADE)
-    post = models.ForeignKey(to=Post, related_name='reactions', on_delete=models.CASCADE)
+    # indexed by reaction_post_value_idx
+    post = models.ForeignKey(to=Post, related_name='reactions', on_delete=models.CASCADE, db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        indexes = [
+            # reactions of a post counted by value without reading the table
+            models.Index(fields=['post', 'value'], name='reaction_post_value_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 'author',
@@ -62,15 +104,40 @@ class Reaction(models.Model):
             ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered to adjust post counters when the reaction is toggled
+        if 'value' in field_names:
+            instance._loaded_value = instance.value
+        return instance
+
     def __str__(self):
         return self.value
 
 
+REACTION_COUNTER_FIELDS = {value: f'{value}_count' for value in Reaction.Values.values}
+
+
 class Chat(models.Model):
+    PREVIEW_LENGTH = 100
+
     user_1 = models.ForeignKey(to=User, related_name='chats_as_user1', on_delete=models.CASCADE)
     user_2 = models.ForeignKey(to=User, related_name='chats_as_user2', on_delete=models.CASCADE)
+    # denormalized from Messages, kept in sync by general.signals
+    last_message = models.ForeignKey(to='Messages',
+                                     related_name='+',
+                                     on_delete=models.SET_NULL,
+                                     null=True,
+                                     blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default='')
 
     class Meta:
+        indexes = [
+            models.Index(fields=['user_1', '-last_message_at'], name='chat_user_1_last_message_idx'),
+            models.Index(fields=['user_2', '-last_message_at'], name='chat_user_2_last_message_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 functions.Greatest(F('user_1'), F('user_2')),
@@ -82,6 +149,36 @@ class Chat(models.Model):
 
 class Messages(models.Model):
     content = models.TextField()
-    chat = models.ForeignKey( to=Chat, related_name='messages', on_delete=models.CASCADE)
+    # indexed by messages_chat_idx
+    chat = models.ForeignKey( to=Chat, related_name='messages', on_delete=models.CASCADE, db_index=False)
     author = models.ForeignKey(to=User, related_name='messages', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # chat history, newest first
+            models.Index(fields=['chat', '-id'], name='messages_chat_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # chat's last message columns are updated by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+
+class TimelineEntry(models.Model):
+    """
+    Materialized home feed: one row per post copied into a friend's timeline
+    """
+    owner = models.ForeignKey(to=User, related_name='timeline', on_delete=models.CASCADE)
+    post = models.ForeignKey(to=Post, related_name='timeline_entries', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                'owner',
+                'post',
+                name='owner_post_unique'
+            ),
+        ]
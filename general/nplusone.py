@@ -0,0 +1,153 @@
+"""
+Detection of N+1 queries
+
+Every query of a request is reduced to its shape (parameters, literals and
+IN lists removed); a shape repeated NPLUSONE_THRESHOLD times or more is an
+N+1 query. Repeats are attributed to the serializer field being rendered
+when they were made, e.g. "CommentSerializer.author", or to the first
+frame of project code.
+
+NPlusOneTestMixin fails APITestCase tests whose client requests have N+1
+queries; NPlusOneMiddleware logs them for a sample of production requests.
+"""
+import logging
+import random
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|\d+|\'[^\']*\')\s*,?)+\)', re.IGNORECASE)
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+SPACES = re.compile(r'\s+')
+# transaction control repeats by nature
+IGNORED = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def fingerprint(sql):
+    """
+    Shape of ``sql``: the same for queries that only differ in their values
+    """
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    return SPACES.sub(' ', sql.replace('%s', '?')).strip()
+
+
+def query_origin(frame):
+    """
+    Serializer field being rendered in ``frame`` or its callers, else the first project frame
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    project_frame = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'to_representation':
+            serializer = frame.f_locals.get('self')
+            field = frame.f_locals.get('field')
+            if isinstance(serializer, BaseSerializer) and field is not None:
+                return f'{type(serializer).__name__}.{field.field_name}'
+        if project_frame is None and code.co_filename.startswith(str(settings.BASE_DIR)) \
+                and 'site-packages' not in code.co_filename and code.co_filename != __file__:
+            project_frame = f'{code.co_filename}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return project_frame or 'unknown'
+
+
+class Repetition:
+    def __init__(self, fingerprint, count, origins):
+        self.fingerprint = fingerprint
+        self.count = count
+        self.origins = origins
+
+    def __str__(self):
+        origins = ', '.join(f'{origin} ({count}x)' for origin, count in self.origins.most_common())
+        return f'{self.count} queries of shape {self.fingerprint!r}, repeated from {origins}'
+
+
+class NPlusOneDetector:
+    """
+    Records query shapes on every database while it is entered
+
+    Origins are only looked up from the second query of a shape on,
+    so unique queries cost a regex substitution.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.counts = Counter()
+        self.origins = {}
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(IGNORED):
+            shape = fingerprint(sql)
+            self.counts[shape] += 1
+            if self.counts[shape] > 1:
+                self.origins.setdefault(shape, Counter())[query_origin(sys._getframe(1))] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def repetitions(self):
+        return [Repetition(shape, count, self.origins.get(shape, Counter()))
+                for shape, count in self.counts.most_common() if count >= self.threshold]
+
+
+class NPlusOneTestMixin:
+    """
+    APITestCase mixin failing tests whose client requests make N+1 queries
+
+    Queries of the test itself (factories, assertions) are not checked.
+    Set ``nplusone_threshold`` on the test case to change NPLUSONE_THRESHOLD.
+    """
+    nplusone_threshold = None
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        request = self.client.request
+
+        def checked_request(**kwargs):
+            with self.assertNoNPlusOne():
+                return request(**kwargs)
+
+        self.client.request = checked_request
+
+    @contextmanager
+    def assertNoNPlusOne(self, threshold=None):
+        with NPlusOneDetector(threshold or self.nplusone_threshold) as detector:
+            yield detector
+        repetitions = detector.repetitions()
+        if repetitions:
+            self.fail('N+1 queries:\n' + '\n'.join(str(repetition) for repetition in repetitions))
+
+
+class NPlusOneMiddleware:
+    """
+    Logs N+1 queries of a NPLUSONE_SAMPLE_RATE share of requests
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.NPLUSONE_SAMPLE_RATE:
+            return self.get_response(request)
+        with NPlusOneDetector() as detector:
+            response = self.get_response(request)
+        for repetition in detector.repetitions():
+            logger.warning('N+1 queries in %s %s: %s', request.method, request.path, repetition)
+        return response
@@ -0,0 +1,163 @@
+"""
+Read/write splitting between the primary database and a read replica
+
+ReplicaMiddleware marks safe requests (GET, HEAD, OPTIONS) and ReplicaRouter
+sends their reads to the "replica" alias, everything else uses "default".
+A client that has just written is pinned to the primary for
+REPLICA_STICKY_SECONDS, so it reads its own writes although the replica
+lags behind: by a cache key of its user and by a cookie for clients whose
+user is not known before the view runs.
+
+The replica is configured with DATABASE_REPLICA_NAME, for SQLite a copy of
+the primary kept up to date by "manage.py sync_replica".
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_enabled():
+    # a replica mirroring the primary, as in tests, is the primary
+    if REPLICA_DB_ALIAS not in settings.DATABASES:
+        return False
+    return connections[REPLICA_DB_ALIAS].settings_dict['NAME'] != connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+
+
+@contextmanager
+def primary_reads():
+    """
+    Sends the reads of the block to the primary, e.g. to build data that outlives the replica lag
+    """
+    token = _read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get() and replica_enabled():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets the schema with the data
+        return db == DEFAULT_DB_ALIAS
+
+
+def request_user_id(request):
+    """
+    Id of the user making ``request`` without querying the database: from the JWT or the session
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = header and authentication.get_raw_token(header)
+    if raw_token:
+        try:
+            return authentication.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM]
+        except (InvalidToken, TokenError, KeyError):
+            return None
+    return None
+
+
+def pin_key(user_id):
+    return f'replica:pin:{user_id}'
+
+
+def is_pinned(request):
+    if PIN_COOKIE in request.COOKIES:
+        return True
+    user_id = request_user_id(request)
+    return user_id is not None and caches[settings.REPLICA_PIN_CACHE_ALIAS].get(pin_key(user_id)) is not None
+
+
+def pin(request, response):
+    """
+    Sends the reads of the client making ``request`` to the primary for REPLICA_STICKY_SECONDS
+    """
+    seconds = settings.REPLICA_STICKY_SECONDS
+    user_id = request_user_id(request)
+    if user_id is not None:
+        caches[settings.REPLICA_PIN_CACHE_ALIAS].set(pin_key(user_id), 1, seconds)
+    response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+
+
+class ReplicaMiddleware:
+    """
+    Reads of safe requests go to the replica unless the client has just written
+
+    Must come after AuthenticationMiddleware to recognize session users.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_enabled():
+            return self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        token = _read_from_replica.set(safe and not is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        if not safe:
+            pin(request, response)
+        return response
+
+
+def copy_database(source, target):
+    """
+    Copies the SQLite database ``source`` to ``target`` with the online backup API
+
+    The copy is consistent even while ``source`` is written to, and it
+    replaces ``target`` atomically so that readers never see a partial file.
+
+    :param source: database file or an open sqlite3 connection
+    """
+    # a temporary file of its own, overlapping syncs must not write to the same one
+    directory, name = os.path.split(os.path.abspath(target))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f'{name}.', suffix='.tmp', delete=False) as file:
+        tmp_target = file.name
+    try:
+        source_connection = source if isinstance(source, sqlite3.Connection) else sqlite3.connect(source)
+        try:
+            target_connection = sqlite3.connect(tmp_target)
+            try:
+                source_connection.backup(target_connection)
+                # WAL mode is stored in the file, a replaced file must not be paired with the -wal of the old one
+                target_connection.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                target_connection.close()
+        finally:
+            if source_connection is not source:
+                source_connection.close()
+        os.replace(tmp_target, target)
+    except BaseException:
+        os.remove(tmp_target)
+        raise
@@ -0,0 +1,141 @@
+"""
+OpenAPI schema served from files built at deploy time
+
+Generating the schema introspects every viewset and serializer, which is
+too slow to repeat on every request. "manage.py build_schema" writes it to
+OPENAPI_SCHEMA_DIR in YAML and JSON, each with a gzipped copy; schema_view
+serves these files with an ETag so that polling clients get 304 responses.
+Only dev generates the schema on the fly, and only when it is not built.
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+# format: file name, content type, renderer; the first one is served by default like SpectacularAPIView does
+FORMATS = {
+    'yaml': ('schema.yaml', 'application/vnd.oai.openapi; charset=utf-8', OpenApiYamlRenderer),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json', OpenApiJsonRenderer),
+}
+MEDIA_TYPES = {
+    'application/vnd.oai.openapi': 'yaml',
+    'application/yaml': 'yaml',
+    'application/vnd.oai.openapi+json': 'json',
+    'application/json': 'json',
+}
+GZIP = re.compile(r'\bgzip\b')
+
+live_schema_view = SpectacularAPIView.as_view()
+
+
+def generate_schema():
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def write_atomic(path, data):
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def build_schema(directory):
+    """
+    Writes the schema in every format of FORMATS to ``directory``
+
+    :return: list of written paths
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    schema = generate_schema()
+    paths = []
+    for file_name, _, renderer_class in FORMATS.values():
+        body = renderer_class().render(schema, renderer_context={})
+        path = directory / file_name
+        gzip_path = directory / f'{file_name}.gz'
+        # mtime=0 keeps the gzipped file identical for an identical schema
+        write_atomic(gzip_path, gzip.compress(body, compresslevel=9, mtime=0))
+        write_atomic(path, body)
+        paths += [path, gzip_path]
+    return paths
+
+
+class SchemaFile:
+    def __init__(self, path, content_type):
+        self.content_type = content_type
+        self.body = path.read_bytes()
+        gzip_path = path.with_name(f'{path.name}.gz')
+        self.gzipped = gzip_path.read_bytes() if gzip_path.exists() else gzip.compress(self.body, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = quote_etag(digest)
+        self.gzip_etag = quote_etag(f'{digest}-gzip')
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def load_schema_file(schema_format):
+    """
+    Built schema in ``schema_format``, read again when the file changed; None when it is not built
+    """
+    file_name, content_type, _ = FORMATS[schema_format]
+    path = Path(settings.OPENAPI_SCHEMA_DIR) / file_name
+    try:
+        key = (path, path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    with _files_lock:
+        schema_file = _files.get(schema_format)
+        if schema_file is None or schema_file[0] != key:
+            schema_file = _files[schema_format] = (key, SchemaFile(path, content_type))
+    return schema_file[1]
+
+
+def requested_format(request):
+    schema_format = request.GET.get('format')
+    if schema_format in FORMATS:
+        return schema_format
+    for media_type in request.accepted_types:
+        schema_format = MEDIA_TYPES.get(f'{media_type.main_type}/{media_type.sub_type}')
+        if schema_format:
+            return schema_format
+    return next(iter(FORMATS))
+
+
+@require_safe
+def schema_view(request):
+    """
+    OpenAPI schema built by "manage.py build_schema", YAML or JSON by content negotiation or ?format=
+    """
+    schema_file = load_schema_file(requested_format(request))
+    if schema_file is None:
+        if settings.DJANGO_ENV == 'dev':
+            return live_schema_view(request)
+        return HttpResponse('The OpenAPI schema is not built, run "manage.py build_schema"',
+                            status=503, content_type='text/plain')
+
+    use_gzip = bool(GZIP.search(request.headers.get('Accept-Encoding', '')))
+    etag = schema_file.gzip_etag if use_gzip else schema_file.etag
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(schema_file.gzipped if use_gzip else schema_file.body,
+                                content_type=schema_file.content_type)
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Vary'] = 'Accept, Accept-Encoding'
+    # clients revalidate with If-None-Match, a new deploy is seen at once
+    response['Cache-Control'] = 'no-cache'
+    return response
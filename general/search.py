@@ -0,0 +1,133 @@
+"""
+Full-text search over posts and comments
+
+On SQLite it reads the FTS5 tables created by migration 0005_search_index,
+ranked by bm25 (post titles weigh more than bodies). Other databases fall
+back to an unranked icontains lookup.
+"""
+import re
+from django.utils.html import escape
+from django.db import connections, router
+from django.db.models import Q
+from general.models import Post, Comment
+
+KINDS = ('post', 'comment')
+TITLE_WEIGHT = 10.0
+# snippet() wraps matches in these, they become <mark> tags once the user text is escaped
+MARK_START, MARK_END = '\x02', '\x03'
+
+POSTS_SQL = """
+SELECT 'post' AS kind, rowid AS id, bm25(general_post_fts, {title_weight}, 1.0) AS rank,
+       snippet(general_post_fts, -1, char(2), char(3), '...', 12) AS snippet
+FROM general_post_fts WHERE general_post_fts MATCH %s
+"""
+COMMENTS_SQL = """
+SELECT 'comment' AS kind, rowid AS id, bm25(general_comment_fts) AS rank,
+       snippet(general_comment_fts, 0, char(2), char(3), '...', 12) AS snippet
+FROM general_comment_fts WHERE general_comment_fts MATCH %s
+"""
+
+
+def match_expression(text):
+    """
+    FTS5 query matching every word of ``text`` as a prefix
+
+    Words are quoted, so FTS5 operators typed by users are searched literally.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def highlight(snippet):
+    """
+    HTML of a snippet: user text escaped, matches in <mark>
+    """
+    return escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class SearchResult:
+    def __init__(self, kind, id, rank, snippet, obj=None):
+        self.kind = kind
+        self.id = id
+        self.rank = rank
+        self.snippet = snippet
+        self.obj = obj
+
+    @property
+    def position(self):
+        return [self.rank, self.kind, self.id]
+
+
+class Search:
+    """
+    Ranked matches of ``text`` among posts and/or comments
+
+    Windows are keyset paginated on (rank, kind, id), so reading a later page
+    does not re-read the earlier ones.
+    """
+
+    def __init__(self, text, kinds=KINDS):
+        self.text = text
+        self.kinds = kinds
+
+    def window(self, after=None, limit=10):
+        match = match_expression(self.text)
+        if not match:
+            return []
+        db = router.db_for_read(Post)
+        connection = connections[db]
+        if connection.vendor == 'sqlite':
+            results = self.ranked(connection, match, after, limit)
+        else:
+            results = self.unranked(after, limit)
+        return self.attach_objects(results)
+
+    def ranked(self, connection, match, after, limit):
+        parts, params = [], []
+        if 'post' in self.kinds:
+            parts.append(POSTS_SQL.format(title_weight=TITLE_WEIGHT))
+            params.append(match)
+        if 'comment' in self.kinds:
+            parts.append(COMMENTS_SQL)
+            params.append(match)
+        sql = f"SELECT kind, id, rank, snippet FROM ({' UNION ALL '.join(parts)})"
+        if after is not None:
+            sql += " WHERE (rank, kind, id) > (%s, %s, %s)"
+            params.extend(after)
+        sql += " ORDER BY rank, kind, id LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchResult(*row) for row in cursor.fetchall()]
+
+    def unranked(self, after, limit):
+        words = re.findall(r'\w+', self.text)
+        results = []
+        for kind in sorted(self.kinds):
+            if after is not None and kind < after[1]:
+                continue
+            if kind == 'post':
+                queryset = Post.objects.all()
+                for word in words:
+                    queryset = queryset.filter(Q(title__icontains=word) | Q(body__icontains=word))
+            else:
+                queryset = Comment.objects.all()
+                for word in words:
+                    queryset = queryset.filter(body__icontains=word)
+            if after is not None and kind == after[1]:
+                queryset = queryset.filter(id__gt=after[2])
+            ids = queryset.order_by('id').values_list('id', flat=True)[:limit - len(results)]
+            results.extend(SearchResult(kind, pk, 0.0, '') for pk in ids)
+            if len(results) >= limit:
+                break
+        return results
+
+    def attach_objects(self, results):
+        posts = Post.objects.select_related('author').in_bulk(
+            [result.id for result in results if result.kind == 'post'])
+        comments = Comment.objects.select_related('author').in_bulk(
+            [result.id for result in results if result.kind == 'comment'])
+        for result in results:
+            result.obj = (posts if result.kind == 'post' else comments).get(result.id)
+            if result.obj is not None:
+                result.snippet = highlight(result.snippet or result.obj.body[:60])
+        return [result for result in results if result.obj is not None]
@@ -0,0 +1,216 @@
+from collections import Counter
+from django.db import connections, router, transaction
+from django.db.models import OuterRef, Subquery, Q, Value, F, Count
+from django.utils import timezone
+from django.db.models.functions import Coalesce, Substr, Greatest
+from general import cache
+from general.models import Post, Comment, Reaction, Chat, Messages, REACTION_COUNTER_FIELDS
+
+
+def update_chat_last_message(message):
+    """
+    Points the chat of ``message`` to it, unless the chat already shows a newer message
+
+    :param message: created or edited Messages instance
+    :return: number of updated chats
+    """
+    return Chat.objects.filter(
+        Q(last_message__isnull=True) | Q(last_message_id__lte=message.pk),
+        pk=message.chat_id,
+    ).update(
+        last_message=message,
+        last_message_at=message.created_at,
+        last_message_preview=message.content[:Chat.PREVIEW_LENGTH],
+    )
+
+
+def refresh_chat_last_message(chats):
+    """
+    Recomputes last message columns of every chat in ``chats`` with one UPDATE
+
+    :param chats: Chat queryset
+    :return: number of updated chats
+    """
+    latest = Messages.objects.filter(chat=OuterRef('pk')).order_by('-id')
+    preview = latest.annotate(
+        preview=Substr('content', 1, Chat.PREVIEW_LENGTH)
+    ).values('preview')[:1]
+    return chats.update(
+        last_message=Subquery(latest.values('id')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        last_message_preview=Coalesce(Subquery(preview), Value('')),
+    )
+
+
+def count_subquery(queryset, field):
+    """
+    Number of ``queryset`` rows whose ``field`` points to the outer row, 0 when there are none
+
+    :param queryset: queryset of the related model
+    :param field: name of the foreign key to the outer model
+    :return: expression usable in annotate() and update()
+    """
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(field)
+        .annotate(count=Count('*')).values('count')
+    ), 0)
+
+
+def apply_reaction_change(post_id, old_value, new_value):
+    """
+    Moves one reaction between post counters with F-expressions
+
+    :param old_value: previous Reaction.value or None
+    :param new_value: current Reaction.value or None
+    """
+    if old_value == new_value:
+        return
+    counters = {}
+    if old_value:
+        field = REACTION_COUNTER_FIELDS[old_value]
+        # never below 0: a drifted counter must not fail the write, reconcile_post_counters fixes it
+        counters[field] = Greatest(F(field) - 1, 0)
+    if new_value:
+        field = REACTION_COUNTER_FIELDS[new_value]
+        counters[field] = F(field) + 1
+    Post.objects.filter(pk=post_id).update(**counters)
+
+
+def apply_comment_change(post_id, delta):
+    Post.objects.filter(pk=post_id).update(comments_count=Greatest(F('comments_count') + delta, 0))
+
+
+def counter_expressions():
+    """
+    Actual values of the post counters computed from Reaction and Comment tables
+
+    :return: dict of counter field name to expression over OuterRef('pk')
+    """
+    expressions = {'comments_count': count_subquery(Comment.objects.all(), 'post')}
+    for value, field in REACTION_COUNTER_FIELDS.items():
+        expressions[field] = count_subquery(Reaction.objects.filter(value=value), 'post')
+    return expressions
+
+
+def reconcile_post_counters(posts):
+    """
+    Rewrites drifted counters of ``posts`` with one UPDATE per counter
+
+    :param posts: Post queryset
+    :return: dict of counter field name to number of fixed posts
+    """
+    fixed = {}
+    for field, expression in counter_expressions().items():
+        fixed[field] = posts.annotate(actual=expression).exclude(
+            **{field: F('actual')}
+        ).update(**{field: expression})
+    return fixed
+
+
+# The previous value is read by a materialized CTE, which is evaluated before the upsert.
+# "WHERE" is required by SQLite to parse INSERT ... SELECT ... ON CONFLICT.
+TOGGLE_REACTION_SQL = """
+WITH previous AS MATERIALIZED (
+    SELECT value FROM {table} WHERE author_id = %s AND post_id = %s
+)
+INSERT INTO {table} (author_id, post_id, value, created_at)
+SELECT %s, %s, %s, %s WHERE (SELECT COUNT(*) FROM previous) >= 0
+ON CONFLICT (author_id, post_id) DO UPDATE SET value = CASE
+    WHEN {table}.value = excluded.value THEN NULL
+    ELSE excluded.value
+END
+RETURNING id, author_id, post_id, value, created_at, (SELECT value FROM previous) AS previous_value
+"""
+
+
+def toggle_reaction(author, post, value):
+    """
+    Sets reaction ``value`` of ``author`` on ``post``, or clears it when it is already set
+
+    One INSERT ... ON CONFLICT DO UPDATE on author_post_unique, so concurrent
+    taps can not race; the statement also returns the previous value
+    for the post counters.
+
+    :return: Reaction with its final value
+    """
+    db = router.db_for_write(Reaction)
+    connection = connections[db]
+    sql = TOGGLE_REACTION_SQL.format(table=connection.ops.quote_name(Reaction._meta.db_table))
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic(using=db):
+        reaction, = Reaction.objects.raw(
+            sql, [author.pk, post.pk, author.pk, post.pk, value, created_at], using=db
+        )
+        apply_reaction_change(post.pk, reaction.previous_value, reaction.value)
+        cache.invalidate('post', post.pk)
+    return reaction
+
+
+def begin_write(model, using):
+    """
+    Takes the write lock of the current transaction before its reads
+
+    select_for_update() does nothing on SQLite, where a transaction that reads
+    first fails with "database is locked" instead of waiting busy_timeout
+    when another writer commits before its first write.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {connection.ops.quote_name(model._meta.db_table)} SET id = id WHERE 0')
+
+
+def bulk_toggle_reactions(author, items):
+    """
+    Applies reaction toggles of ``author`` in order, as repeated toggle_reaction() calls would
+
+    Toggles of the same post are collapsed into its final value, which is
+    written with one upsert; counters change once per touched post.
+
+    :param items: list of (post id, value)
+    :return: list of the value each toggle left on its post
+    """
+    post_ids = {post_id for post_id, _ in items}
+    db = router.db_for_write(Reaction)
+    with transaction.atomic(using=db):
+        begin_write(Reaction, db)
+        previous = dict(
+            Reaction.objects.using(db).select_for_update()
+            .filter(author=author, post_id__in=post_ids).values_list('post_id', 'value')
+        )
+        current = dict(previous)
+        results = []
+        for post_id, value in items:
+            current[post_id] = None if current.get(post_id) == value else value
+            results.append(current[post_id])
+        changed = [post_id for post_id in current if post_id not in previous or previous[post_id] != current[post_id]]
+        Reaction.objects.using(db).bulk_create(
+            [Reaction(author=author, post_id=post_id, value=current[post_id]) for post_id in changed],
+            update_conflicts=True,
+            unique_fields=['author', 'post'],
+            update_fields=['value'],
+        )
+        for post_id in changed:
+            apply_reaction_change(post_id, previous.get(post_id), current[post_id])
+        if changed:
+            cache.invalidate('post', *changed)
+    return results
+
+
+def bulk_create_comments(author, items):
+    """
+    Creates comments of ``author`` with one INSERT per batch, counters change once per post
+
+    :param items: list of (post id, body)
+    :return: created Comment instances
+    """
+    with transaction.atomic():
+        comments = Comment.objects.bulk_create(
+            [Comment(author=author, post_id=post_id, body=body) for post_id, body in items]
+        )
+        added = Counter(post_id for post_id, _ in items)
+        for post_id, count in added.items():
+            apply_comment_change(post_id, count)
+        if added:
+            cache.invalidate('post', *added)
+    return comments
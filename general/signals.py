@@ -0,0 +1,139 @@
+from functools import partial
+from django.db import transaction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from general.models import User, Post, Comment, Reaction, Chat, Messages
+from general.services import update_chat_last_message, refresh_chat_last_message, \
+    apply_reaction_change, apply_comment_change
+from general.feed import fan_out_post, backfill_timeline, drop_from_timeline
+from general import cache
+from general.graph import apply_friendship_change
+from general.replica import REPLICA_DB_ALIAS
+
+
+def deletion_origin(origin):
+    """
+    Model whose delete() (on an instance or a queryset) caused the cascade
+    """
+    return getattr(origin, 'model', type(origin))
+
+
+@receiver(post_save, sender=Messages)
+def message_saved(sender, instance, **kwargs):
+    update_chat_last_message(instance)
+
+
+@receiver(post_delete, sender=Messages)
+def message_deleted(sender, instance, origin=None, **kwargs):
+    # the chat (or its user) is being deleted together with its messages
+    if deletion_origin(origin) is not Messages:
+        return
+    # SET_NULL has already cleared the pointer if this was the last message
+    refresh_chat_last_message(
+        Chat.objects.filter(pk=instance.chat_id, last_message__isnull=True)
+    )
+
+
+@receiver(post_save, sender=Reaction)
+def reaction_saved(sender, instance, created, **kwargs):
+    old_value = None if created else getattr(instance, '_loaded_value', None)
+    apply_reaction_change(instance.post_id, old_value, instance.value)
+    instance._loaded_value = instance.value
+    cache.invalidate('post', instance.post_id)
+
+
+@receiver(post_delete, sender=Reaction)
+def reaction_deleted(sender, instance, origin=None, **kwargs):
+    if deletion_origin(origin) is not Post:
+        apply_reaction_change(instance.post_id, instance.value, None)
+        cache.invalidate('post', instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_comment_change(instance.post_id, 1)
+        cache.invalidate('post', instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if deletion_origin(origin) is not Post:
+        apply_comment_change(instance.post_id, -1)
+        cache.invalidate('post', instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        fan_out_post(instance)
+    cache.invalidate('post', instance.pk)
+    cache.invalidate('user', instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    cache.invalidate('post', instance.pk)
+    cache.invalidate('user', instance.author_id)
+
+
+def friend_ids(user_id):
+    return set(User.friends.through.objects.filter(from_user_id=user_id).values_list('to_user_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    cache.invalidate('user', instance.pk)
+    # unknown when the instance was not loaded from the database
+    if not created and getattr(instance, '_loaded_username', None) != instance.username:
+        # the username is shown in the posts and reactions of the user and in the friends of friends
+        post_ids = set(Post.objects.filter(author_id=instance.pk).values_list('pk', flat=True))
+        post_ids.update(Reaction.objects.filter(author_id=instance.pk).values_list('post_id', flat=True))
+        cache.invalidate('post', *post_ids)
+        cache.invalidate('user', *friend_ids(instance.pk))
+    instance._loaded_username = instance.username
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # friendships are deleted without m2m_changed; posts and reactions invalidate their posts
+    instance._deleted_friend_ids = friend_ids(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    cache.invalidate('user', instance.pk, *instance.__dict__.pop('_deleted_friend_ids', set()))
+
+
+@receiver(m2m_changed, sender=User.friends.through)
+def friends_changed(sender, instance, action, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._cleared_friend_ids = set(instance.friends.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        action, pk_set = 'post_remove', instance.__dict__.pop('_cleared_friend_ids', set())
+
+    if action in ('post_add', 'post_remove'):
+        cache.invalidate('user', instance.pk, *pk_set)
+        transaction.on_commit(partial(apply_friendship_change, instance.pk, set(pk_set), action == 'post_add'))
+
+    if action == 'post_add':
+        backfill_timeline(instance.pk, pk_set)
+        for friend_id in pk_set:
+            backfill_timeline(friend_id, [instance.pk])
+    elif action == 'post_remove':
+        drop_from_timeline(instance.pk, pk_set)
+        for friend_id in pk_set:
+            drop_from_timeline(friend_id, [instance.pk])
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    # the replica file is replaced by sync_replica, WAL files next to it would not belong to the new one
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS or connection.alias == REPLICA_DB_ALIAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
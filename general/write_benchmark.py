@@ -0,0 +1,116 @@
+"""
+Concurrent write benchmark of the SQLite database profiles
+
+Every profile gets a fresh copy of the database; worker processes then
+send messages and toggle reactions on it at the same time, the way
+several application workers do. Run it on a seeded database
+(manage.py generate_dataset) to compare throughput and lock errors of the
+"default" and "production" profiles.
+"""
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from django.conf import settings
+from django.db import connection, OperationalError
+from general.models import User, Post, Chat, Messages, Reaction
+from general.replica import copy_database
+from general.services import toggle_reaction
+
+# SQLITE_PRAGMAS of every profile, journal_mode is reset on the copy as WAL is stored in the file
+PROFILE_PRAGMAS = {
+    'default': {'journal_mode': 'DELETE'},
+    'production': settings.SQLITE_PRODUCTION_PRAGMAS,
+}
+
+
+def write(rng, ids):
+    if rng.random() < 0.5:
+        chat_id, author_id = rng.choice(ids['chats'])
+        Messages.objects.create(chat_id=chat_id, author_id=author_id, content='benchmark message')
+    else:
+        toggle_reaction(User(pk=rng.choice(ids['users'])), Post(pk=rng.choice(ids['posts'])),
+                        rng.choice(Reaction.Values.values))
+
+
+def worker(path, pragmas, ids, writes, start_at, seed, results):
+    """
+    Runs in a forked process: makes ``writes`` writes to the database at ``path``
+    """
+    # the inherited SQLite handle must not be used nor closed after fork()
+    connection.connection = None
+    connection.settings_dict['NAME'] = path
+    settings.SQLITE_PRAGMAS = pragmas
+    rng = random.Random(seed)
+    latencies = []
+    locked = 0
+    time.sleep(max(start_at - time.time(), 0))
+    try:
+        for _ in range(writes):
+            started = time.perf_counter()
+            try:
+                write(rng, ids)
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                locked += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+    except Exception as error:
+        # reported instead of raised, the parent waits for a result of every worker
+        results.put({'error': repr(error)})
+        return
+    finally:
+        connection.close()
+    results.put({'latencies': latencies, 'locked': locked, 'finished_at': time.time()})
+
+
+def run_profile(profile, ids, workers, writes, directory):
+    path = os.path.join(directory, f'{profile}.sqlite3')
+    copy_database(connection.connection, path)
+    pragmas = PROFILE_PRAGMAS[profile]
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    start_at = time.time() + 0.5
+    processes = [
+        context.Process(target=worker, args=(path, pragmas, ids, writes, start_at, seed, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    errors = [report['error'] for report in reports if 'error' in report]
+    if errors:
+        raise RuntimeError(f'{profile} worker failed: {errors[0]}')
+    latencies = sorted(latency for report in reports for latency in report['latencies'])
+    elapsed = max(report['finished_at'] for report in reports) - start_at
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else (latencies or [0.0]) * 99
+    return {
+        'writes': len(latencies),
+        'locked': sum(report['locked'] for report in reports),
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 3),
+        'p99_ms': round(quantiles[98] * 1000, 3),
+    }
+
+
+def run(profiles=tuple(PROFILE_PRAGMAS), workers=8, writes=200):
+    """
+    :return: dict of profile name to its results
+    """
+    ids = {
+        'users': list(User.objects.values_list('pk', flat=True)),
+        'posts': list(Post.objects.values_list('pk', flat=True)),
+        'chats': list(Chat.objects.values_list('pk', 'user_1_id')),
+    }
+    missing = [name for name, values in ids.items() if not values]
+    if missing:
+        raise ValueError(f'No {", ".join(missing)} to write to, seed the database first')
+    connection.ensure_connection()
+    with tempfile.TemporaryDirectory() as directory:
+        return {profile: run_profile(profile, ids, workers, writes, directory) for profile in profiles}